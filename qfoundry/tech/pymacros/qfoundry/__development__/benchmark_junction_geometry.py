@@ -0,0 +1,61 @@
+"""
+Microbenchmarks for the junction geometry kernel (qfoundry.junctions.utils).
+
+Times the primitives called once per junction when a PCell is produced (arc,
+draw_junction, draw_patch with and without scratches, draw_patch_openning) and
+projects the cost for a 10k junction layout. Run it on two revisions to compare.
+
+Usage (standalone klayout Python module, or any interpreter that provides pya):
+    python benchmark_junction_geometry.py [--number 2000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from math import pi
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pya
+from qfoundry.junctions.utils import arc, draw_junction, draw_patch, draw_patch_openning
+
+# Default Manhattan junction parameters
+_JUNCTION = dict(angle=45.0, inner_angle=90.0, junction_width_b=0.2, junction_width_t=0.2, finger_size=3.0,
+                 mirror_offset=0.0, offset_compensation=0.0, finger_overshoot=0.5, finger_overlap=1.0,
+                 center=pya.DPoint(0, 0), dbu=0.001)
+_PATCH = dict(finger_size=3.0, cap_gap=2.0, conn_width=3.0, conn_height=10.0, angle=45.0, inner_angle=90.0,
+              patch_clearance=10.0, finger_overlap=1.0, center=pya.DPoint(0, 0), dbu=0.001)
+_OPENING = dict(finger_size=3.0, conn_width=3.0, heigth=10.0, angle=45.0, inner_angle=90.0, gap=2.0,
+                finger_overlap=1.0, round_radius=0.5)
+
+KERNELS = {
+    "arc (r=5, quarter, n=64)": lambda: arc(5.0, 0, pi / 2, 64),
+    "arc (r=5, full, n=256)": lambda: arc(5.0, 0, 2 * pi, 256),
+    "draw_junction": lambda: draw_junction(**_JUNCTION),
+    "draw_patch": lambda: draw_patch(patch_scratch=False, **_PATCH),
+    "draw_patch (scratches)": lambda: draw_patch(patch_scratch=True, **_PATCH),
+    "draw_patch_openning": lambda: draw_patch_openning(**_OPENING),
+}
+
+
+def benchmark_kernels(number=2000, repeat=5):
+    """
+    Time every kernel.
+
+    Returns:
+        dict: {kernel name: best time per call in seconds}
+    """
+    return {name: min(timeit.repeat(kernel, number=number, repeat=repeat)) / number
+            for name, kernel in KERNELS.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--number", type=int, default=2000, help="Calls per timing sample")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing samples per kernel (best one is kept)")
+    args = parser.parse_args()
+
+    results = benchmark_kernels(args.number, args.repeat)
+    for name, seconds in results.items():
+        print(f"{name:<28} {seconds * 1e6:8.1f} us/call   {seconds * 1e4:7.2f} s per 10k junctions")
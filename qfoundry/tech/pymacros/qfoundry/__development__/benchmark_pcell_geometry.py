@@ -0,0 +1,248 @@
+"""
+Geometry complexity benchmark of the QFoundry PCells.
+
+Registers the library, produces every registered PCell (plus the KQCircuits
+based markers) through the library at default parameters and across the
+variants of PARAMETER_MATRIX, and records the produce time, the polygon and
+vertex count per layer and the bounding box of each variant.
+
+The results are compared against a JSON baseline: a variant fails when its
+vertex or polygon count on any layer grows by more than --threshold, or its
+produce time by more than --time-threshold. Run with --update to (re)write the
+baseline after an intended change. The geometry cache is disabled, so the
+shapes are always built.
+
+The committed baseline (pcell_geometry_baseline.json) records the KLayout and
+KQCircuits versions it was produced with; a comparison against other versions
+is noted, as the KQCircuits based cells (frames, markers) depend on them.
+Produce times depend on the machine, regenerate the baseline (--update) on the
+machine running the gate before relying on --time-threshold.
+
+Usage (standalone klayout Python module, or any interpreter that provides pya):
+    python benchmark_pcell_geometry.py [--baseline pcell_geometry_baseline.json] [--update]
+                                       [--threshold 0.05] [--time-threshold 0.5] [--repeat 3]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pya
+from qfoundry.cache import geometry_cache
+from qfoundry.scripts.library import __PDK_Lib__, PCELL_IDS
+from qfoundry.scripts.sweep import LIBRARY_NAME
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pcell_geometry_baseline.json")
+BASELINE_VERSION = 1
+
+# Variants produced in addition to the defaults, PCell name -> [parameters, ...]
+PARAMETER_MATRIX = {
+    "Transmon": [{"corner_radius": 5.0}, {"keepout_corner_radius": 0.0}, {"resolution": 128}],
+    "TransmonStar": [{"corner_radius": 5.0}, {"resolution": 120}],
+    "BridgeQubit": [{"round_path": False}],
+    "BenasqueBridge": [{"round_path": False}],
+    "Manhattan": [{"draw_cap": True}, {"patch_scratch": True}],
+    "ManhattanFatLead": [{"draw_patch": True}, {"draw_cap": True}],
+}
+
+# Produce times below this (seconds) are too noisy to flag as regressions
+MIN_TIME_DELTA = 0.005
+
+
+def pcell_declarations():
+    """Every PCell declaration to benchmark, PCell name -> pya.PCellDeclaration."""
+    library = __PDK_Lib__(lazy=False)
+    declarations = {name: library.layout().pcell_declaration(pcell_id) for name, pcell_id in PCELL_IDS.items()}
+
+    # KQCircuits based markers live below elements/markers, outside the library folders;
+    # registered in the library layout too, so they are produced the same way
+    if "QfoundryMarkerCross" not in declarations:
+        from qfoundry.elements.markers.qfoundryMarkerCross import QfoundryMarkerCross
+        declaration = QfoundryMarkerCross()
+        library.layout().register_pcell("QfoundryMarkerCross", declaration)
+        declarations["QfoundryMarkerCross"] = declaration
+    return declarations
+
+
+def tool_versions():
+    """KLayout and KQCircuits versions the results are produced with."""
+    if hasattr(pya, "__version__"):
+        klayout = pya.__version__
+    else:
+        klayout = pya.Application.instance().version().split()[-1]
+    try:
+        from importlib.metadata import version
+        kqcircuits = version("kqcircuits")
+    except Exception:
+        kqcircuits = None
+    return {"klayout": klayout, "kqcircuits": kqcircuits}
+
+
+def variant_name(pcell_name, params):
+    if not params:
+        return pcell_name
+    return pcell_name + "[" + ",".join(f"{name}={params[name]}" for name in sorted(params)) + "]"
+
+
+def produce_variant(pcell_name, declaration, params, dbu=0.001, technology="qfoundry"):
+    """
+    Produce one variant through the registered library, as a layout placing the PCell does.
+
+    The variant is produced in the library layout (so PCells placing other library
+    PCells find them), copied into a new layout with the given database unit and
+    removed from the library again, so the next call produces it anew instead of
+    reusing the library's variant.
+
+    Returns:
+        tuple: (layout, cell, produce time in seconds)
+    """
+    unknown = set(params) - set(p.name for p in declaration.get_parameters())
+    if unknown:
+        raise ValueError(f"{pcell_name} has no parameter(s) {sorted(unknown)}")
+
+    library = pya.Library.library_by_name(LIBRARY_NAME, technology)
+    if library is None or library.layout().pcell_id(pcell_name) is None:
+        raise RuntimeError(f"{pcell_name} PCell not found in library {LIBRARY_NAME}")
+    library_layout = library.layout()
+
+    start = time.perf_counter()
+    variant = library_layout.create_cell(pcell_name, params)
+    seconds = time.perf_counter() - start
+
+    layout = pya.Layout()
+    layout.dbu = dbu
+    layout.technology_name = technology
+    cell = layout.create_cell(pcell_name)
+    cell.copy_tree(variant)
+    library_layout.prune_cell(variant.cell_index(), -1)
+    return layout, cell, seconds
+
+
+def geometry_stats(layout, cell):
+    """Polygon and vertex count per layer ("l/d") and bounding box (μm), hierarchy flattened."""
+    layers = {}
+    for layer_index in layout.layer_indexes():
+        polygons = vertices = 0
+        iterator = cell.begin_shapes_rec(layer_index)
+        while not iterator.at_end():
+            shape = iterator.shape()
+            if shape.is_polygon() or shape.is_box() or shape.is_path():
+                polygons += 1
+                vertices += shape.polygon.num_points()
+            iterator.next()
+        if polygons:
+            layers[layout.get_info(layer_index).to_s()] = {"polygons": polygons, "vertices": vertices}
+    box = cell.dbbox()
+    return {"layers": layers, "bbox": [round(c, 4) for c in (box.left, box.bottom, box.right, box.top)]}
+
+
+def benchmark_pcells(repeat=3, dbu=0.001):
+    """
+    Produce every PCell variant.
+
+    Returns:
+        dict: variant name -> {"seconds": best produce time, "layers": {...}, "bbox": [...]}
+              or {"error": message} when the variant could not be produced.
+    """
+    cache_enabled = geometry_cache.enabled
+    geometry_cache.enabled = False
+    try:
+        results = {}
+        for pcell_name, declaration in sorted(pcell_declarations().items()):
+            for params in [{}] + PARAMETER_MATRIX.get(pcell_name, []):
+                name = variant_name(pcell_name, params)
+                try:
+                    times = []
+                    for _ in range(repeat):
+                        layout, cell, seconds = produce_variant(pcell_name, declaration, params, dbu)
+                        times.append(seconds)
+                except Exception as e:
+                    results[name] = {"error": f"{type(e).__name__}: {e}"}
+                    continue
+                results[name] = dict(seconds=round(min(times), 6), **geometry_stats(layout, cell))
+    finally:
+        geometry_cache.enabled = cache_enabled
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold=0.05, time_threshold=0.5):
+    """
+    Compare benchmark results with a baseline.
+
+    Returns:
+        tuple: (regressions, notes), lists of messages. Regressions fail the suite.
+    """
+    regressions, notes = [], []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if "error" in result:
+            regressions.append(f"{name}: {result['error']}")
+            continue
+        if reference is None or "error" in reference:
+            notes.append(f"{name}: not in baseline")
+            continue
+        for layer, counts in result["layers"].items():
+            reference_counts = reference["layers"].get(layer, {"polygons": 0, "vertices": 0})
+            for key in ("polygons", "vertices"):
+                if counts[key] > reference_counts[key] * (1 + threshold):
+                    regressions.append(f"{name} {layer}: {key} {reference_counts[key]} -> {counts[key]}")
+        seconds, reference_seconds = result["seconds"], reference["seconds"]
+        if seconds > reference_seconds * (1 + time_threshold) and seconds - reference_seconds > MIN_TIME_DELTA:
+            regressions.append(f"{name}: produce time {reference_seconds * 1e3:.1f} ms -> {seconds * 1e3:.1f} ms")
+        if result["bbox"] != reference["bbox"]:
+            notes.append(f"{name}: bbox {reference['bbox']} -> {result['bbox']}")
+    for name in baseline:
+        if name not in results:
+            notes.append(f"{name}: no longer produced")
+    return regressions, notes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--update", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.05, help="Allowed relative growth of polygon/vertex counts")
+    parser.add_argument("--time-threshold", type=float, default=0.5, help="Allowed relative growth of produce time")
+    parser.add_argument("--repeat", type=int, default=3, help="Produce runs per variant (best one is kept)")
+    args = parser.parse_args()
+
+    results = benchmark_pcells(args.repeat)
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<48} ERROR {result['error']}")
+            continue
+        polygons = sum(counts["polygons"] for counts in result["layers"].values())
+        vertices = sum(counts["vertices"] for counts in result["layers"].values())
+        print(f"{name:<48} {result['seconds'] * 1e3:9.2f} ms {polygons:>8} polygons {vertices:>9} vertices")
+
+    if args.update:
+        with open(args.baseline, "w") as f:
+            json.dump({"version": BASELINE_VERSION, "tools": tool_versions(), "variants": results}, f,
+                      indent=1, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        sys.exit(0)
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except OSError:
+        print(f"No baseline at {args.baseline}: the committed one is missing, restore it from git "
+              f"or create one with --update")
+        sys.exit(1)
+    if baseline.get("version") != BASELINE_VERSION:
+        print(f"Baseline {args.baseline} has an unsupported version, run with --update")
+        sys.exit(1)
+
+    regressions, notes = compare_to_baseline(results, baseline["variants"], args.threshold, args.time_threshold)
+    if baseline.get("tools") != tool_versions():
+        notes.insert(0, f"baseline produced with {baseline.get('tools')}, running {tool_versions()}")
+    for note in notes:
+        print(f"note: {note}")
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    print(f"{len(regressions)} regression(s) in {len(results)} variants")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,114 @@
+"""
+Headless produce-time benchmark of the QFoundry PCells.
+
+Loads the qfoundry technology (from qfoundry.lyt when it is not registered, as
+with the standalone klayout module), registers the library and times the
+produce of every PCell through the library (see produce_variant in
+benchmark_pcell_geometry.py).
+Each PCell is produced --warmup times untimed, then --repeat times, and the
+minimum, median, p90, p99 and maximum produce times are reported.
+
+Runs without a display, either with the standalone klayout Python module:
+    python benchmark_pcells.py [--warmup 2] [--repeat 20] [--pcells Transmon,Manhattan] [--output times.json]
+or in KLayout batch mode, with the options given as -rd variables:
+    klayout -b -r benchmark_pcells.py -rd repeat=20 -rd pcells=Transmon -rd output=times.json
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pya
+from qfoundry.cache import geometry_cache
+from qfoundry.__development__.benchmark_pcell_geometry import pcell_declarations, produce_variant
+
+TECHNOLOGY_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "qfoundry.lyt"))
+
+
+def load_technology(name="qfoundry"):
+    """Return the technology, loading it from qfoundry.lyt when KLayout has not registered it."""
+    if pya.Technology.has_technology(name):
+        return pya.Technology.technology_by_name(name)
+    technology = pya.Technology.create_technology(name)
+    technology.load(TECHNOLOGY_FILE)
+    return technology
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list."""
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def benchmark_produce(pcells=None, warmup=2, repeat=20, technology="qfoundry"):
+    """
+    Time the produce of each PCell at its default parameters.
+
+    Args:
+        pcells (list[str]): PCell names to benchmark, all registered PCells when None.
+        warmup (int): Untimed produce runs before measuring (imports, caches).
+        repeat (int): Timed produce runs.
+        technology (str): Technology giving the database unit.
+
+    Returns:
+        dict: PCell name -> {"min", "p50", "p90", "p99", "max"} in seconds,
+              or {"error": message} when the PCell could not be produced.
+    """
+    dbu = load_technology(technology).dbu
+    declarations = pcell_declarations()
+    cache_enabled = geometry_cache.enabled
+    geometry_cache.enabled = False
+    try:
+        results = {}
+        for name in pcells or sorted(declarations):
+            if name not in declarations:
+                results[name] = {"error": "not a registered PCell"}
+                continue
+            try:
+                for _ in range(warmup):
+                    produce_variant(name, declarations[name], {}, dbu, technology)
+                times = sorted(produce_variant(name, declarations[name], {}, dbu, technology)[2] for _ in range(repeat))
+            except Exception as e:
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+                continue
+            results[name] = {"min": times[0], "p50": percentile(times, 0.5), "p90": percentile(times, 0.9),
+                             "p99": percentile(times, 0.99), "max": times[-1]}
+    finally:
+        geometry_cache.enabled = cache_enabled
+    return results
+
+
+def _options():
+    """Options from the command line, or from the -rd variables under klayout -b -r."""
+    application = getattr(pya, "Application", None)
+    if application and application.instance():
+        variables = globals()
+        pcells = variables.get("pcells")
+        return argparse.Namespace(warmup=int(variables.get("warmup", 2)), repeat=int(variables.get("repeat", 20)),
+                                  pcells=pcells.split(",") if pcells else None, output=variables.get("output"))
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed produce runs per PCell")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed produce runs per PCell")
+    parser.add_argument("--pcells", type=lambda value: value.split(","), default=None,
+                        help="Comma separated PCell names (default: all registered PCells)")
+    parser.add_argument("--output", default=None, help="Write the results to a JSON file")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    options = _options()
+    results = benchmark_produce(options.pcells, options.warmup, options.repeat)
+
+    print(f"{'PCell':<24} {'min':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  (ms)")
+    for name, result in results.items():
+        if "error" in result:
+            print(f"{name:<24} ERROR {result['error']}")
+            continue
+        print(f"{name:<24} " + " ".join(f"{result[key] * 1e3:9.2f}" for key in ("min", "p50", "p90", "p99", "max")))
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump({"warmup": options.warmup, "repeat": options.repeat, "pcells": results}, f, indent=1)
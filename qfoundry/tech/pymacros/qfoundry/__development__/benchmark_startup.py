@@ -0,0 +1,65 @@
+"""
+Startup benchmark for the QFoundry PCell library.
+
+Compares the cold import + registration time of the eager library (every PCell
+module imported at startup) against the lazy, manifest-driven library. Every
+sample runs in a fresh interpreter so module caches do not leak between runs.
+
+Usage (standalone klayout Python module, or any interpreter that provides pya):
+    python benchmark_startup.py [--repeat 5]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+PYMACROS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+_SNIPPET = """
+import sys, time
+sys.path.insert(0, {path!r})
+t0 = time.perf_counter()
+from qfoundry.scripts.library import __PDK_Lib__
+__PDK_Lib__(lazy={lazy})
+print(time.perf_counter() - t0)
+"""
+
+
+def cold_start(lazy):
+    """Import and register the library in a fresh interpreter, return the elapsed time in seconds."""
+    code = _SNIPPET.format(path=PYMACROS_DIR, lazy=lazy)
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark_startup(repeat=5):
+    """
+    Measure cold startup of the eager and the lazy library.
+
+    The eager run also (re)generates the manifest, so the lazy runs that follow
+    always hit an up-to-date manifest.
+
+    Returns:
+        dict: {"eager": [seconds, ...], "lazy": [seconds, ...]}
+    """
+    results = {"eager": [], "lazy": []}
+    for _ in range(repeat):
+        results["eager"].append(cold_start(lazy=False))
+    for _ in range(repeat):
+        results["lazy"].append(cold_start(lazy=True))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5, help="Cold starts per mode")
+    args = parser.parse_args()
+
+    results = benchmark_startup(args.repeat)
+    eager = statistics.median(results["eager"])
+    lazy = statistics.median(results["lazy"])
+    print(f"Eager startup: median {eager:.3f} s  (min {min(results['eager']):.3f} s)")
+    print(f"Lazy startup:  median {lazy:.3f} s  (min {min(results['lazy']):.3f} s)")
+    print(f"Speedup: {eager / lazy:.2f}x")
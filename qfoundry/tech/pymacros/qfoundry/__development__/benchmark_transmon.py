@@ -0,0 +1,111 @@
+"""
+Profile the Transmon geometry assembly across circle resolutions.
+
+Times Transmon._produce_shapes (the geometry cache is bypassed) for the
+current source and, with --rev, for the Transmon.py of another git revision
+loaded side by side, and reports the speedup per resolution. The vertex count
+of both versions is printed too, so a change in the geometry is visible.
+
+--rev must not be older than the persistent geometry cache (user-002), which
+split the geometry out of produce_impl into _produce_shapes; older revisions
+are rejected.
+
+Usage (standalone klayout Python module, or any interpreter that provides pya):
+    python benchmark_transmon.py [--rev HEAD~1] [--resolutions 48,96,192,384] [--number 20] [--repeat 5]
+"""
+
+import argparse
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pya
+from qfoundry.qubits.Transmon import Transmon
+
+TRANSMON_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "qubits", "Transmon.py"))
+
+
+def transmon_at_revision(rev):
+    """Load the Transmon declaration class of Transmon.py as of a git revision."""
+    source = subprocess.run(["git", "show", f"{rev}:./{os.path.basename(TRANSMON_FILE)}"],
+                            cwd=os.path.dirname(TRANSMON_FILE), capture_output=True, check=True).stdout
+    with tempfile.NamedTemporaryFile("wb", suffix=".py", delete=False) as f:
+        f.write(source)
+    try:
+        spec = importlib.util.spec_from_file_location("_transmon_" + rev.replace("~", "_").replace("^", "_"), f.name)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.remove(f.name)
+    if not hasattr(module.Transmon, "_produce_shapes"):
+        raise SystemExit(f"Transmon.py at {rev} has no _produce_shapes (older than the geometry cache), "
+                         f"pick a later revision")
+    return module.Transmon
+
+
+# PCellDeclarationHelper binds and releases the parameter values with _init_values/_finish
+# since KLayout 0.29, init_values/finish before
+def _init_values(declaration, values):
+    (getattr(declaration, "_init_values", None) or declaration.init_values)(values)
+
+
+def _finish(declaration):
+    (getattr(declaration, "_finish", None) or declaration.finish)()
+
+
+def bound_declaration(declaration_class, params, dbu=0.001):
+    """A declaration with its parameter values bound, the way produce() binds them, ready for _produce_shapes."""
+    declaration = declaration_class()
+    layout = pya.Layout()
+    layout.dbu = dbu
+    _init_values(declaration,
+                 declaration.coerce_parameters(layout, [params.get(p.name, p.default) for p in declaration.get_parameters()]))
+    return declaration
+
+
+def profile_resolutions(declaration_classes, resolutions, number=20, repeat=5, dbu=0.001):
+    """
+    Time _produce_shapes for every declaration class and resolution.
+
+    Returns:
+        dict: (label, resolution) -> (best seconds per call, total vertex count)
+    """
+    results = {}
+    for label, declaration_class in declaration_classes.items():
+        for resolution in resolutions:
+            declaration = bound_declaration(declaration_class, {"resolution": resolution}, dbu)
+            seconds = min(timeit.repeat(lambda: declaration._produce_shapes(dbu), number=number, repeat=repeat)) / number
+            vertices = sum(polygon.num_points() for region in declaration._produce_shapes(dbu).values()
+                           for polygon in region.each())
+            results[(label, resolution)] = (seconds, vertices)
+            _finish(declaration)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rev", default=None, help="Git revision of Transmon.py to compare against")
+    parser.add_argument("--resolutions", type=lambda value: [int(v) for v in value.split(",")],
+                        default=[48, 96, 192, 384], help="Comma separated circle resolutions")
+    parser.add_argument("--number", type=int, default=20, help="Calls per timing sample")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing samples (best one is kept)")
+    args = parser.parse_args()
+
+    declaration_classes = {"current": Transmon}
+    if args.rev:
+        declaration_classes[args.rev] = transmon_at_revision(args.rev)
+    results = profile_resolutions(declaration_classes, args.resolutions, args.number, args.repeat)
+
+    print(f"{'resolution':>10} " + " ".join(f"{label:>22}" for label in declaration_classes) +
+          ("    speedup" if args.rev else ""))
+    for resolution in args.resolutions:
+        row = [results[(label, resolution)] for label in declaration_classes]
+        line = f"{resolution:>10} " + " ".join(f"{seconds * 1e3:9.2f} ms {vertices:>7} v" for seconds, vertices in row)
+        if args.rev:
+            line += f"  {row[1][0] / row[0][0]:8.2f}x"
+        print(line)
@@ -0,0 +1,45 @@
+"""
+Library registration check of scripts/sweep.py new_layout: the PDK library is
+registered by the first call only, later calls reuse it.
+
+Usage:
+    python -m qfoundry.__development__.new_layout_test
+"""
+
+import pya
+
+from qfoundry.scripts import library
+from qfoundry.scripts.sweep import LIBRARY_NAME, new_layout
+
+
+def new_layout_test():
+    print("QFoundry PDK: new_layout library registration test")
+    registrations = []
+    load_library = library.load_library
+
+    def counting_load_library():
+        registrations.append(load_library())
+        return registrations[-1]
+
+    library.load_library = counting_load_library
+    try:
+        first = new_layout()
+        registered = pya.Library.library_by_name(LIBRARY_NAME, first.technology_name)
+        count = len(registrations)
+        new_layout()
+    finally:
+        library.load_library = load_library
+
+    failures = 0
+    if len(registrations) != count or count > 1:
+        print(f"FAILED: {len(registrations)} library registrations for two new_layout() calls, expected at most 1")
+        failures += 1
+    if pya.Library.library_by_name(LIBRARY_NAME, first.technology_name) is not registered:
+        print("FAILED: the second new_layout() call replaced the registered library")
+        failures += 1
+    print(f"Tests complete, {failures} failure(s).")
+    return failures
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if new_layout_test() else 0)
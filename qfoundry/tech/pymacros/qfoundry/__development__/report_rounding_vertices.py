@@ -0,0 +1,98 @@
+"""
+Vertex savings of the adaptive corner rounding (qfoundry.utils.rounding_points).
+
+Produces every PCell below twice in a scratch layout, once with the fixed
+per-call-site point counts and once in adaptive mode, and reports the vertex
+count per layer and the savings. The geometry cache is disabled so both runs
+really build the shapes.
+
+Usage (standalone klayout Python module, or any interpreter that provides pya):
+    python report_rounding_vertices.py [--tolerance 0.05]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+import pya
+from qfoundry import utils
+from qfoundry.cache import geometry_cache
+from qfoundry.junctions.Manhattan import Manhattan
+from qfoundry.junctions.ManhattanFatLead import ManhattanFatLead
+from qfoundry.qubits.Transmon import Transmon
+from qfoundry.qubits.TransmonStar import TransmonStar
+
+# PCell name -> (declaration class, parameters)
+PCELLS = {
+    "Manhattan": (Manhattan, {}),
+    "ManhattanFatLead": (ManhattanFatLead, {}),
+    "Transmon": (Transmon, {}),
+    "TransmonStar": (TransmonStar, {"corner_radius": 5.0}),
+}
+
+
+def vertex_counts(name, declaration_class, params, mode, dbu=0.001):
+    """
+    Produce one PCell variant with the given rounding mode.
+
+    Returns:
+        dict: layer ("l/d") -> number of vertices, hierarchy flattened.
+    """
+    utils.ROUNDING_MODE = mode
+    layout = pya.Layout()
+    layout.dbu = dbu
+    layout.register_pcell(name, declaration_class())
+    cell = layout.create_cell(name, params)
+
+    counts = {}
+    for layer_index in layout.layer_indexes():
+        vertices = sum(polygon.num_points() for polygon in pya.Region(cell.begin_shapes_rec(layer_index)).each())
+        if vertices:
+            counts[layout.get_info(layer_index).to_s()] = vertices
+    return counts
+
+
+def rounding_report(tolerance=None):
+    """
+    Compare fixed and adaptive rounding for every PCell of PCELLS.
+
+    Returns:
+        list[tuple]: (PCell, layer, fixed vertices, adaptive vertices) rows.
+    """
+    mode, previous_tolerance, cache_enabled = utils.ROUNDING_MODE, utils.ROUNDING_TOLERANCE, geometry_cache.enabled
+    if tolerance is not None:
+        utils.ROUNDING_TOLERANCE = tolerance
+    geometry_cache.enabled = False
+    try:
+        rows = []
+        for name, (declaration_class, params) in PCELLS.items():
+            fixed = vertex_counts(name, declaration_class, params, "fixed")
+            adaptive = vertex_counts(name, declaration_class, params, "adaptive")
+            for layer in sorted(set(fixed) | set(adaptive)):
+                rows.append((name, layer, fixed.get(layer, 0), adaptive.get(layer, 0)))
+    finally:
+        utils.ROUNDING_MODE, utils.ROUNDING_TOLERANCE, geometry_cache.enabled = mode, previous_tolerance, cache_enabled
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tolerance", type=float, default=None,
+                        help=f"Maximum chord error in um (default {utils.ROUNDING_TOLERANCE})")
+    args = parser.parse_args()
+
+    rows = rounding_report(args.tolerance)
+    print(f"{'PCell':<18} {'Layer':<8} {'Fixed':>9} {'Adaptive':>9} {'Saved':>7}")
+    totals = {}
+    for name, layer, fixed, adaptive in rows:
+        saved = 100.0 * (fixed - adaptive) / fixed if fixed else 0.0
+        print(f"{name:<18} {layer:<8} {fixed:>9} {adaptive:>9} {saved:>6.1f}%")
+        total = totals.setdefault(name, [0, 0])
+        total[0] += fixed
+        total[1] += adaptive
+    print()
+    for name, (fixed, adaptive) in totals.items():
+        saved = 100.0 * (fixed - adaptive) / fixed if fixed else 0.0
+        print(f"{name:<18} {'all':<8} {fixed:>9} {adaptive:>9} {saved:>6.1f}%")
@@ -0,0 +1,35 @@
+"""
+Centerline length checks of scripts/waveguide_length.py against hand computed paths.
+
+Usage:
+    python -m qfoundry.__development__.waveguide_length_test
+"""
+
+import numpy as np
+
+from qfoundry.scripts.waveguide_length import centerline_lengths
+
+
+def waveguide_length_test():
+    print("QFoundry PDK: waveguide centerline length tests")
+    r = 50.0
+    cases = [
+        ("straight", [(0, 0), (300, 0), (500, 0)], 500.0),
+        ("90 degree bend", [(0, 0), (200, 0), (200, 200)], 400.0 - 2 * r + np.pi / 2 * r),
+        # Reversal: two 90 degree bends, each replacing 2*r of straight by a quarter circle
+        ("180 degree reversal", [(0, 0), (200, 0), (100, 0)], 300.0 + 2 * (np.pi / 2 - 2) * r),
+        ("reversal after a bend", [(0, 0), (200, 0), (200, 200), (200, 100)],
+         500.0 + (np.pi / 2 - 2) * r + 2 * (np.pi / 2 - 2) * r),
+    ]
+    lengths = centerline_lengths([np.array(points, dtype=float) for _, points, _ in cases], [r] * len(cases))
+    failures = 0
+    for (name, _, expected), length in zip(cases, lengths):
+        if not np.isfinite(length) or abs(length - expected) > 1e-9:
+            print(f"FAILED {name}: {length} µm, expected {expected} µm")
+            failures += 1
+    print(f"Tests complete, {failures} failure(s) in {len(cases)} paths.")
+    return failures
+
+
+if __name__ == "__main__":
+    raise SystemExit(1 if waveguide_length_test() else 0)
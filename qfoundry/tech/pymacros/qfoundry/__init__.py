@@ -3,8 +3,18 @@ from importlib import reload
 
 from ._version import __version__
 
-from .chips.FrameQF10 import FrameQF10
-from .chips.FrameQF5 import FrameQF5
 from .defaults import *
 
-from .utils import test_pcell, _round_corners_and_append, _add_shapes, _substract_shapes
\ No newline at end of file
+from .utils import test_pcell, _round_corners_and_append, _add_shapes, _substract_shapes, ShapePipeline, rounding_points, layer_registry
+
+
+def __getattr__(name):
+    # Chip frames pull in most of KQCircuits, import them on first access only
+    # so that loading the PDK library stays fast.
+    if name == "FrameQF10":
+        from .chips.FrameQF10 import FrameQF10
+        return FrameQF10
+    if name == "FrameQF5":
+        from .chips.FrameQF5 import FrameQF5
+        return FrameQF5
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,173 @@
+"""Persistent on-disk geometry cache for PCell variants.
+
+Produced shapes are stored per layer in a content-addressed file, keyed by a
+hash of the PCell parameters, the database unit, the PDK version and a salt
+(typically a hash of the PCell source), so a cache hit can replay the geometry
+without redoing the boolean operations.
+
+The cache lives in ``$QFOUNDRY_CACHE_DIR`` (default ``~/.cache/qfoundry/geometry``)
+and keeps at most ``$QFOUNDRY_CACHE_SIZE`` entries (default 512), evicting the
+least recently used ones. Set ``QFOUNDRY_CACHE=0`` to disable it.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+import pya
+
+from qfoundry._version import __version__
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "qfoundry", "geometry")
+DEFAULT_MAX_ENTRIES = 512
+
+
+def source_hash(file_path):
+    """Return a short content hash of a source file, used to salt cache keys."""
+    with open(file_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:16]
+
+
+def _encode_param(value):
+    if isinstance(value, pya.LayerInfo):
+        return value.to_s()
+    if isinstance(value, (list, tuple)):
+        return [_encode_param(v) for v in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def encode_polygon(polygon):
+    """Polygon as plain lists: [hull] or [hull, holes], each a flat x, y coordinate list (JSON and pickle safe)."""
+    hull = [c for p in polygon.each_point_hull() for c in (p.x, p.y)]
+    holes = [[c for p in polygon.each_point_hole(h) for c in (p.x, p.y)]
+             for h in range(polygon.holes())]
+    return [hull, holes] if holes else [hull]
+
+
+def decode_polygon(data):
+    """Inverse of encode_polygon."""
+    def points(flat):
+        return [pya.Point(flat[i], flat[i + 1]) for i in range(0, len(flat), 2)]
+
+    polygon = pya.Polygon(points(data[0]), True)
+    for hole in (data[1] if len(data) > 1 else []):
+        polygon.insert_hole(points(hole), True)
+    return polygon
+
+
+class GeometryCache:
+    """Content-addressed store of per-layer shapes with LRU eviction.
+
+    Args:
+        cache_dir (str): Directory holding the cache entries.
+        max_entries (int): Number of entries kept before evicting the least recently used.
+        enabled (bool): When False, lookups always miss and nothing is written.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=None, enabled=None):
+        self.cache_dir = cache_dir or os.environ.get("QFOUNDRY_CACHE_DIR", DEFAULT_CACHE_DIR)
+        self.max_entries = int(max_entries or os.environ.get("QFOUNDRY_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+        if enabled is None:
+            enabled = os.environ.get("QFOUNDRY_CACHE", "1") not in ("0", "false", "False")
+        self.enabled = enabled
+
+    def key(self, pcell_name, params, dbu, salt=""):
+        """Hash a PCell parameter set into a cache key.
+
+        Args:
+            pcell_name (str): Name of the PCell, namespaces the key.
+            params (dict): Parameter name -> value.
+            dbu (float): Database unit of the target layout.
+            salt (str): Extra invalidation token (e.g. a hash of the PCell source).
+
+        Returns:
+            str: Hex digest identifying the variant.
+        """
+        payload = {
+            "pcell": pcell_name,
+            "params": {name: _encode_param(params[name]) for name in sorted(params)},
+            "dbu": dbu,
+            "version": __version__,
+            "salt": salt,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json.gz")
+
+    def load(self, key):
+        """Return the cached shapes as {LayerInfo: Region}, or None on a miss."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        # Refresh the access time used for LRU eviction.
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        shapes = {}
+        for layer, polygons in data["layers"].items():
+            region = pya.Region()
+            for polygon in polygons:
+                region.insert(decode_polygon(polygon))
+            shapes[pya.LayerInfo.from_string(layer)] = region
+        return shapes
+
+    def store(self, key, shapes):
+        """Store {LayerInfo: Region} under key. Write errors are ignored (the cache is optional)."""
+        if not self.enabled:
+            return
+        data = {"layers": {layer.to_s(): [encode_polygon(p) for p in region.each()]
+                           for layer, region in shapes.items()}}
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                f.write(json.dumps(data, separators=(",", ":")).encode("utf-8"))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: could not write geometry cache entry {path}: {e}")
+            return
+        self.evict()
+
+    def evict(self):
+        """Delete the least recently used entries above max_entries."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for file_name in files:
+                if file_name.endswith(".json.gz"):
+                    path = os.path.join(root, file_name)
+                    try:
+                        entries.append((os.path.getmtime(path), path))
+                    except OSError:
+                        pass
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove every cache entry."""
+        max_entries, self.max_entries = self.max_entries, 0
+        self.evict()
+        self.max_entries = max_entries
+
+
+# Shared cache instance used by the PCells.
+geometry_cache = GeometryCache()
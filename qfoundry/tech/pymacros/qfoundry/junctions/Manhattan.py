@@ -8,12 +8,7 @@ from math import pi
 
 from kqcircuits.util.symmetric_polygons import polygon_with_vsym
 from qfoundry.junctions.utils import arc, draw_junction, draw_pad, draw_patch, draw_patch_openning
-from qfoundry.utils import _add_shapes
-
-NEGATIVE_LAYERS = [
-    pya.LayerInfo(1, 0),
-    pya.LayerInfo(130, 1),
-]
+from qfoundry.utils import ShapePipeline, layer_registry
 
 
 class Manhattan(pya.PCellDeclarationHelper):
@@ -72,6 +67,10 @@ class Manhattan(pya.PCellDeclarationHelper):
             """Draws the Manhattan junction"""
             dbu = self.layout.dbu
             has_connectors = (self.conn_height != 0) and (self.conn_width != 0)
+            shapes = ShapePipeline(self.cell)
+            layers = layer_registry(self.layout)
+            layer_cap = layers.index(self.cap_layer)
+            layer_add = layers.index(pya.LayerInfo(131, 1))
 
             #Junction
             finger_shapes = draw_junction(angle = self.angle,
@@ -84,11 +83,11 @@ class Manhattan(pya.PCellDeclarationHelper):
                                           finger_overshoot = self.finger_overshoot,
                                           finger_overlap = self.finger_overlap,
                                           bottom_lead_comp = 0, center = pya.DPoint(0, 0), dbu = dbu)
-            layer_jj = self.layout.layer(self.l_layer)
-            _add_shapes(self.cell, finger_shapes, layer_jj)
+            layer_jj = layers.index(self.l_layer)
+            shapes.add(layer_jj, finger_shapes)
             if has_connectors:
                 conn_shapes = self.draw_connectors(pya.DPoint(0, 0))
-                _add_shapes(self.cell, conn_shapes, layer_jj)
+                shapes.add(layer_jj, conn_shapes)
 
             # Capacitor
             if self.draw_cap:
@@ -99,12 +98,9 @@ class Manhattan(pya.PCellDeclarationHelper):
                 metal_neg = pya.Box(-(self.cap_w+80)/dbu/2, -(self.cap_h+40+self.cap_gap/2)/dbu,
                                     (self.cap_w+80)/dbu/2, (self.cap_h+40+self.cap_gap/2)/dbu)
 
-                region_pos = pya.Region(cap_shape).merged()
-                region_neg = pya.Region(metal_neg).merged()- pya.Region(cap_shape).merged()
-            else:
-                # If no capacitor is drawn, we still need to define the regions
-                region_pos = pya.Region()
-                region_neg = pya.Region()
+                # Positive (131/1) and negative (cap_layer) regions
+                shapes.add(layer_add, cap_shape)
+                shapes.add(layer_cap, metal_neg).subtract(layer_cap, cap_shape)
                 
             if has_connectors:
                 # Patches (maybe not drawn, but always calculated so it can be used for the region logic)
@@ -155,41 +151,22 @@ class Manhattan(pya.PCellDeclarationHelper):
                     (pya.DTrans(0, False, center.x,center.y) * patch_top ).to_itype(dbu),
                     (pya.DTrans(0, False, center.x,center.y) * patch_bot).to_itype(dbu)
                 ]
-                region_pos = region_pos - pya.Region(patch_open_shape).merged()
-                region_neg = region_neg + pya.Region(patch_open_shape).merged()
+                shapes.subtract(layer_add, patch_open_shape)
+                shapes.add(layer_cap, patch_open_shape)
 
                 if self.draw_patch:
-                  layer_patch = self.layout.layer(self.patch_layer)
-                  _add_shapes(self.cell, patch_shape, layer_patch)
+                  layer_patch = layers.index(self.patch_layer)
+                  shapes.add(layer_patch, patch_shape)
 
 
-            # Drwaing and label handling
-            layer_cap = self.layout.layer(self.cap_layer)
-            layer_add = self.layout.layer(pya.LayerInfo(131, 1))
-            
-            if self.draw_cap:
-                trans = pya.Trans(pya.Trans.R0, (-self.cap_w/2+10)/dbu, (self.cap_h-10)/dbu)     
-            
-                # Apply layer logic based on lithography type
-                if layer_cap in [self.layout.layer(layer) for layer in NEGATIVE_LAYERS]: 
-                    # Negative lithography: use separate layers for positive and negative regions
-                    cell_label = self.layout.create_cell("TEXT", "Basic", {"text":self.label, "mag":20,"layer": layer_cap})
-                    cell_instance_lbl = pya.CellInstArray(cell_label.cell_index(),trans)
-                    self.cell.insert(cell_instance_lbl)    
-                else:
-                    # Positive lithography: insert label and subtract from positive region
-                    cell_label = self.layout.create_cell("TEXT", "Basic", {"text":self.label, "mag":20,"layer": layer_add})
-                    cell_instance_lbl = pya.CellInstArray(cell_label.cell_index(),trans)
-                    self.cell.insert(cell_instance_lbl)
-                    # Flatten and subtract the label region from region_pos if needed
-                    region_pos = region_pos - pya.Region(cell_label.shapes(layer_label)).merged()
-            else:
+            # Test pads are not labelled: the original Basic TEXT label received a layer
+            # index instead of a LayerInfo and never drew anything on the cap layer
+            if not self.draw_cap:
                 cell_label = pya.DText(self.label, 0.0, 0.0)
-                layer_label = self.layout.layer(pya.LayerInfo(68, 2))
+                layer_label = layers.index(pya.LayerInfo(68, 2))
                 # self.cell.shapes(layer_label).insert(cell_label)
                 
-            self.cell.shapes(layer_add).insert(region_pos) 
-            self.cell.shapes(layer_cap).insert(region_neg)
+            shapes.flush()
 
     def draw_connectors(self, center=pya.DPoint(0, 0)):
         dbu = self.layout.dbu
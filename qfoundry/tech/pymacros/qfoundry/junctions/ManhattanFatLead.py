@@ -4,12 +4,7 @@ from math import pi
 
 from kqcircuits.util.symmetric_polygons import polygon_with_vsym
 from qfoundry.junctions.utils import arc, draw_junction, draw_pad, draw_patch_openning, draw_patch
-from qfoundry.utils import _add_shapes, _substract_shapes
-
-NEGATIVE_LAYERS = [
-    pya.LayerInfo(1, 0),
-    pya.LayerInfo(130, 1),
-]
+from qfoundry.utils import ShapePipeline, label_cell, label_region, layer_registry
 
 class ManhattanFatLead(pya.PCellDeclarationHelper):
     """
@@ -140,7 +135,8 @@ class ManhattanFatLead(pya.PCellDeclarationHelper):
             None (modifies self.cell directly)
         """
         dbu = self.layout.dbu
-        jj_layer = self.layout.layer(self.l_layer)
+        jj_layer = layer_registry(self.layout).index(self.l_layer)
+        shapes = ShapePipeline(self.cell)
         _angle = radians(self.angle)
         _inner_angle = radians(self.inner_angle)
         size = self.finger_size
@@ -153,7 +149,7 @@ class ManhattanFatLead(pya.PCellDeclarationHelper):
             finger_shapes = draw_junction(self.angle, self.inner_angle, self.junction_width_b, self.junction_width_t+self.junction_width_b, self.finger_size, self.mirror_offset, self.offset_compensation, self.finger_overshoot, 
               finger_overlap = self.conn_width, 
               center = pya.DPoint(0, 0), dbu=dbu)
-            _add_shapes(self.cell, finger_shapes, jj_layer)
+            shapes.add(jj_layer, finger_shapes)
         else:  # SQUID cases
             center1 = pya.DPoint(-self.squid_spacing / 2, 0)
             finger_shapes1 = draw_junction(self.angle, self.inner_angle, self.junction_width_b, self.junction_width_t+self.junction_width_b, self.finger_size, self.mirror_offset, self.offset_compensation, self.finger_overshoot, 
@@ -187,8 +183,8 @@ class ManhattanFatLead(pya.PCellDeclarationHelper):
                                            center = center2, dbu=dbu,
                                            bottom_lead_comp = bottom_lead_comp-   self.conn_width/2
                                         )
-            _add_shapes(self.cell, finger_shapes1, jj_layer)
-            _add_shapes(self.cell, finger_shapes2, jj_layer)
+            shapes.add(jj_layer, finger_shapes1)
+            shapes.add(jj_layer, finger_shapes2)
             
         # Connector leads
         self.top_dx = (size+conn_width/2)*cos(_angle)
@@ -229,8 +225,8 @@ class ManhattanFatLead(pya.PCellDeclarationHelper):
             # conn_shapes2 = [conn_shapes2[0], 
             #                 conn_shapes2[1]*pya.DTrans(0, False, dx2/dbu, 0)]
                             
-            _add_shapes(self.cell, conn_shapes, jj_layer)
-            _add_shapes(self.cell, conn_shapes2, jj_layer)
+            shapes.add(jj_layer, conn_shapes)
+            shapes.add(jj_layer, conn_shapes2)
         else:
             conn_shapes = self.draw_connectors(pya.DPoint(0, 0),
                                                draw_top=True, draw_bot=True,
@@ -240,25 +236,28 @@ class ManhattanFatLead(pya.PCellDeclarationHelper):
                                                            'top_dy': self.top_dy,
                                                            'bot_dx': self.bot_dx,
                                                            'bot_dy': self.bot_dy})
-            _add_shapes(self.cell, conn_shapes, jj_layer)
+            shapes.add(jj_layer, conn_shapes)
         
         label_trans = pya.Trans(pya.Trans.R0, (-self.cap_w/2+10)/dbu, (self.cap_h-10)/dbu)     
-        cell_label = self.layout.create_cell("TEXT", "Basic", {"text":self.label, "mag":20,"layer": pya.LayerInfo(1, 0) })
-        cell_instance_lbl = pya.CellInstArray(cell_label.cell_index(),label_trans)
+        label_layer = pya.LayerInfo(1, 0)
         
+        layers = layer_registry(self.layout)
+        layerm = layers.index(self.cap_layer)
+        negative = layers.is_negative(layerm)
+        # Negative lithography: positive region on 131/1, negative region on the cap layer.
+        # Positive lithography: only the positive region, on the cap layer.
+        layer_pos = layers.index(pya.LayerInfo(131, 1)) if negative else layerm
+
         # Draw test pads (Capacitor)
         if self.draw_cap:
             cap_shape = draw_pad(self.cap_w, self.cap_h, self.cap_gap, dbu)
             metal_neg = pya.Box(-(self.cap_w+80)/dbu/2, -(self.cap_h+40+self.cap_gap/2)/dbu,
                                 (self.cap_w+80)/dbu/2, (self.cap_h+40+self.cap_gap/2)/dbu)
 
-            region_pos = pya.Region(cap_shape).merged()
-            region_neg =  pya.Region(metal_neg).merged()- pya.Region(cap_shape).merged()
-        else:
-            region_pos = pya.Region()
-            region_neg = pya.Region()
+            shapes.add(layer_pos, cap_shape)
+            if negative:
+                shapes.add(layerm, metal_neg).subtract(layerm, cap_shape)
 
-        patch_shape = []
         if self.draw_patch:
             # Patch opening in base metal layer
             center = pya.DPoint(0, 0)
@@ -322,29 +321,22 @@ class ManhattanFatLead(pya.PCellDeclarationHelper):
                 ]
                     
             
-            region_pos = region_pos - pya.Region(patch_open_shape).merged()
-            region_neg = region_neg + pya.Region(patch_open_shape).merged()
+            shapes.subtract(layer_pos, patch_open_shape)
+            if negative:
+                shapes.add(layerm, patch_open_shape)
             
-        layerm = self.layout.layer(self.cap_layer)
-
-        if layerm in [self.layout.layer(layer) for layer in NEGATIVE_LAYERS]: 
-            layer_add = self.layout.layer(pya.LayerInfo(131, 1))
-            self.cell.shapes(layer_add).insert(region_pos) 
-            self.cell.shapes(layerm).insert(region_neg)
+        if negative: 
             if self.draw_cap:
-              self.cell.insert(cell_instance_lbl)    
+              cell_label = label_cell(self.layout, self.label, 20, label_layer)
+              self.cell.insert(pya.CellInstArray(cell_label.cell_index(),label_trans))    
         else:
-            # Convert cell_instance_lbl to a region
+            # Label drawn flat, and its bounding box cleared from the positive region
             if self.draw_cap:
-              self.cell.insert(cell_instance_lbl).flatten()
-              # Subtract the label region from region_pos if label_region
-              region_pos = region_pos - pya.Region(cell_instance_lbl.bbox())
-            
-            self.cell.shapes(layerm).insert(region_pos)
-            #self.cell.shapes(layerm).insert(region_pos) 
-            
-        layer = self.layout.layer(self.patch_layer)
-        _add_shapes(self.cell, patch_shape, layer)
+              region_label = label_region(self.label, dbu, 20).transformed(label_trans)
+              shapes.add(label_layer, region_label)
+              shapes.subtract(layer_pos, region_label.bbox())
+
+        shapes.flush()
   
 
     def draw_connectors(self, center=pya.DPoint(0, 0), draw_top=True, draw_bot=True, 
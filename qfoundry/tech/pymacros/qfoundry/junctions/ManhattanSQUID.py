@@ -1,15 +1,11 @@
 import pya
 
 from qfoundry.junctions.utils import draw_pad
+from qfoundry.utils import label_cell, layer_registry
 
 # Parametric SQUID built from two Manhattan Josephson junction PCell instances
 # Copyright: TII QRC/QFoundry 2026
 
-NEGATIVE_LAYERS = [
-    pya.LayerInfo(1, 0),
-    pya.LayerInfo(130, 1),
-]
-
 # Single-junction parameters that are simply forwarded to each Manhattan instance.
 # Each sub-instance still draws its own connectors and (optionally) its own patch
 # clearance cuts - only the large test pad is shared between the two junctions,
@@ -107,6 +103,21 @@ class ManhattanSQUID(pya.PCellDeclarationHelper):
         params["label"] = ""
         return params
 
+    def _manhattan_pcell_id(self):
+        """PCell id of Manhattan in this layout, as resolved when the library was registered."""
+        from qfoundry.scripts.library import PCELL_IDS
+
+        pcell_id = PCELL_IDS.get("Manhattan")
+        if pcell_id is not None:
+            declaration = self.layout.pcell_declaration(pcell_id)
+            if declaration is not None and declaration.name() == "Manhattan":
+                return pcell_id
+        # Not produced inside the registered library layout: resolve by name
+        declaration = self.layout.pcell_declaration("Manhattan")
+        if declaration is None:
+            raise RuntimeError("Manhattan PCell not found - cannot build SQUID")
+        return declaration.id()
+
     def produceManhattanSQUID(self):
         """Draws the SQUID using two instances of the Manhattan PCell."""
         dbu = self.layout.dbu
@@ -115,10 +126,11 @@ class ManhattanSQUID(pya.PCellDeclarationHelper):
         params1 = self._junction_params(asymmetry=1.0)
         params2 = self._junction_params(asymmetry=self.squid_asymmetry)
 
-        cell1 = self.layout.create_cell(pcell_name="Manhattan", params=params1)
-        cell2 = self.layout.create_cell(pcell_name="Manhattan", params=params2)
-        if cell1 is None or cell2 is None:
-            raise RuntimeError("Manhattan PCell not found - cannot build SQUID")
+        # Symmetric SQUIDs use one junction variant for both instances. Asymmetric ones
+        # share their variants with every other SQUID using the same junction parameters.
+        pcell_id = self._manhattan_pcell_id()
+        cell_index1 = self.layout.add_pcell_variant(pcell_id, params1)
+        cell_index2 = cell_index1 if params2 == params1 else self.layout.add_pcell_variant(pcell_id, params2)
 
         center1 = pya.DPoint(0, 0)
         center2 = pya.DPoint(self.squid_spacing, 0)
@@ -126,8 +138,8 @@ class ManhattanSQUID(pya.PCellDeclarationHelper):
         trans1 = pya.DTrans(0, False, center1.x/dbu, center1.y/dbu)
         trans2 = pya.DTrans(0, reflected, center2.x/dbu, center2.y/dbu)
 
-        self.cell.insert(pya.CellInstArray(cell1.cell_index(), trans1))
-        self.cell.insert(pya.CellInstArray(cell2.cell_index(), trans2))
+        self.cell.insert(pya.CellInstArray(cell_index1, trans1))
+        self.cell.insert(pya.CellInstArray(cell_index2, trans2))
 
         if not self.draw_cap:
             return
@@ -149,19 +161,20 @@ class ManhattanSQUID(pya.PCellDeclarationHelper):
         region_pos = pya.Region(cap_shape).merged()
         region_neg = pya.Region(metal_neg).merged() - region_pos
 
-        layer_cap = self.layout.layer(self.cap_layer)
+        layers = layer_registry(self.layout)
+        layer_cap = layers.index(self.cap_layer)
 
         trans = pya.Trans(
             pya.Trans.R0,
             int(round((midpoint.x - self.cap_w / 2 + 10) / dbu)),
             int(round((midpoint.y + self.cap_h - 10) / dbu)),
         )
-        cell_label = self.layout.create_cell("TEXT", "Basic", {"text": self.label, "mag": 20, "layer": pya.LayerInfo(1, 0)})
+        cell_label = label_cell(self.layout, self.label, 20, pya.LayerInfo(1, 0))
         cell_instance_lbl = pya.CellInstArray(cell_label.cell_index(), trans)
 
-        if layer_cap in [self.layout.layer(layer) for layer in NEGATIVE_LAYERS]:
+        if layers.is_negative(layer_cap):
             # Negative lithography: use separate layers for positive and negative regions
-            layer_add = self.layout.layer(pya.LayerInfo(131, 1))
+            layer_add = layers.index(pya.LayerInfo(131, 1))
             self.cell.shapes(layer_add).insert(region_pos)
             self.cell.shapes(layer_cap).insert(region_neg)
             self.cell.insert(cell_instance_lbl)
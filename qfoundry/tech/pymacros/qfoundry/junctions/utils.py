@@ -1,10 +1,40 @@
 import pya
+import numpy as np
 from numpy import cos, sin, radians, linspace, sign
 from math import pi
 
 from kqcircuits.util.symmetric_polygons import polygon_with_vsym
 from qfoundry.utils import _add_shapes, _round_corners_and_append
 
+# Geometry kernel: vertices are computed as NumPy arrays of shape (..., n_points, 2) in μm
+# and only converted to pya objects once, at the end of each drawing function.
+
+def _to_polygons(vertices, dbu):
+    """
+    Convert stacked vertex arrays (in μm) to integer pya.Polygons in one bulk step.
+
+    Coordinates are scaled by 1/dbu and rounded half away from zero, like DPolygon.to_itype.
+
+    Args:
+        vertices (np.ndarray): Array of shape (n_polygons, n_points, 2) or (n_points, 2).
+        dbu (float): Database unit.
+    Returns:
+        list[pya.Polygon]: One polygon per vertex array.
+    """
+    scaled = np.asarray(vertices, dtype=float).reshape(-1, np.shape(vertices)[-2], 2) * (1.0 / dbu)
+    coords = np.trunc(scaled + np.copysign(0.5, scaled)).astype(np.int64).tolist()
+    return [pya.Polygon([pya.Point(x, y) for x, y in polygon]) for polygon in coords]
+
+def _to_dpolygon(vertices):
+    """Convert one (n_points, 2) vertex array to a pya.DPolygon."""
+    return pya.DPolygon([pya.DPoint(x, y) for x, y in np.asarray(vertices, dtype=float).tolist()])
+
+def _rotate(vertices, rot):
+    """Rotate vertices by rot*90 degrees around the origin (the rotation codes of pya.DTrans)."""
+    x, y = vertices[..., 0], vertices[..., 1]
+    rotated = [(x, y), (-y, x), (-x, -y), (y, -x)][rot % 4]
+    return np.stack(rotated, axis=-1)
+
 def arc(r, start=0, stop=pi/2, n=64):
     """
         r: radius
@@ -15,10 +45,9 @@ def arc(r, start=0, stop=pi/2, n=64):
     step = (stop - start) / n_steps
     r_corner = r / cos(step / 2)
     angles = linspace(start,stop,n_steps+2)
-    points = []
-    for alpha in angles:
-        points.append(pya.DPoint(r_corner * cos(alpha), r_corner * sin(alpha)))
-    return points
+    xs = (r_corner * np.cos(angles)).tolist()
+    ys = (r_corner * np.sin(angles)).tolist()
+    return [pya.DPoint(x, y) for x, y in zip(xs, ys)]
 
 def draw_junction(angle, inner_angle, junction_width_b, junction_width_t, finger_size, mirror_offset, offset_compensation, finger_overshoot, finger_overlap, 
   bottom_lead_comp = 0, center=pya.DPoint(0, 0), dbu = 0.001) -> pya.DPolygon:
@@ -47,17 +76,17 @@ def draw_junction(angle, inner_angle, junction_width_b, junction_width_t, finger
         end_y = size*sin(angle)
         
         return [
-            pya.DPoint(-dx-fo_x, +dy-fo_y),
-            pya.DPoint(dx-fo_x, -dy-fo_y),
-            pya.DPoint(end_x+dx+pl_x, end_y-dy+pl_y),
-            pya.DPoint(end_x-dx+pl_x, end_y+dy+pl_y),
+            (-dx-fo_x, +dy-fo_y),
+            (dx-fo_x, -dy-fo_y),
+            (end_x+dx+pl_x, end_y-dy+pl_y),
+            (end_x-dx+pl_x, end_y+dy+pl_y),
         ]
 
-    finger_bottom = pya.DTrans(0, 0) * pya.DPolygon(finger_points(size,ddb,_angle-(_inner_angle), lead_comp=bottom_lead_comp))
-    finger_top = pya.DTrans(0, 0) * pya.DPolygon(finger_points(size,ddt, _angle))
+    fingers = np.array([finger_points(size,ddt, _angle),
+                        finger_points(size,ddb,_angle-(_inner_angle), lead_comp=bottom_lead_comp)])
     
-    junction_shapes = [ (pya.DTrans(0, False, center.x,center.y) * finger_top).to_itype(dbu),
-                        (pya.DTrans(0, False, center.x,center.y) * finger_bottom).to_itype(dbu)]
+    # [top, bottom]
+    junction_shapes = _to_polygons(fingers + (center.x, center.y), dbu)
     
     return junction_shapes
 
@@ -83,7 +112,8 @@ def draw_pad(cap_w, cap_h, cap_gap, dbu):
 
 
 
-def _patch_scratches(gap, patch_width, conn_height, patch_clearance, size, angle, rot=0, round = False):
+def _scratch_vertices(gap, patch_width, conn_height, patch_clearance, size, angle, rot=0):
+    """Vertex array (4, 2) of a single 45 deg scratch, see _patch_scratches."""
     scratch_w = 0.5
     end_x = size*cos(angle)
     end_y = size*sin(angle)
@@ -99,13 +129,16 @@ def _patch_scratches(gap, patch_width, conn_height, patch_clearance, size, angle
     dy = scratch_w*cos(scratch_ang)
     dx = -scratch_w*sin(scratch_ang)
     
-    polygon = pya.DTrans(0,False, end_x, 0)*pya.DTrans(rot,False, 0, 0) * pya.DPolygon([
-        pya.DPoint(-scratch_x1+dx/2, y0-scratch_y1+dy/2),
-        pya.DPoint(scratch_x1+dx/2, y0+scratch_y1+dy/2),
-        pya.DPoint(scratch_x1-dx/2, y0+scratch_y1-dy/2),
-        pya.DPoint(-scratch_x1-dx/2, y0-scratch_y1-dy/2),
+    vertices = np.array([
+        (-scratch_x1+dx/2, y0-scratch_y1+dy/2),
+        (scratch_x1+dx/2, y0+scratch_y1+dy/2),
+        (scratch_x1-dx/2, y0+scratch_y1-dy/2),
+        (-scratch_x1-dx/2, y0-scratch_y1-dy/2),
     ])
-    return polygon
+    return _rotate(vertices, rot) + (end_x, 0)
+
+def _patch_scratches(gap, patch_width, conn_height, patch_clearance, size, angle, rot=0, round = False):
+    return _to_dpolygon(_scratch_vertices(gap, patch_width, conn_height, patch_clearance, size, angle, rot))
 
 def draw_patch(finger_size, cap_gap, conn_width, conn_height, angle, inner_angle, patch_scratch, patch_clearance=10.0, finger_overlap=1.0,
   center=pya.DPoint(0, 0), dbu=0.001) -> pya.DPolygon:
@@ -126,33 +159,33 @@ def draw_patch(finger_size, cap_gap, conn_width, conn_height, angle, inner_angle
         # connector lead respectively, so the patch stays aligned to the lead.
         fudge = -finger_overlap if direction > 0 else finger_overlap
 
-        polygon = pya.DTrans(0,False, end_x, gap_edge_y+fudge) * pya.DPolygon([
-            pya.DPoint(-patch_width/2, 0),
-            pya.DPoint(patch_width/2, 0),
-            pya.DPoint(patch_width/2, y_size),
-            pya.DPoint(-patch_width/2, y_size),
-        ])
-        return polygon
+        return np.array([
+            (-patch_width/2, 0),
+            (patch_width/2, 0),
+            (patch_width/2, y_size),
+            (-patch_width/2, y_size),
+        ]) + (end_x, gap_edge_y+fudge)
 
-    patches = []
     if patch_scratch:
+        # 5 scratches above the gap, then 5 below it, all converted at once
         dy_arr = linspace(0.0,10.0,5)
-        for dy in dy_arr:
-            patches.append((pya.DTrans(0,False,center.x,dy) * (_patch_scratches(gap, patch_width, conn_height, patch_clearance, size=size,  angle=_angle))).to_itype(dbu))
-        for dy in dy_arr:
-            patches.append((pya.DTrans(0,False,center.x, -dy) * (_patch_scratches(gap, patch_width, conn_height, patch_clearance, size=size,  angle=_angle-(_inner_angle),rot=2))).to_itype(dbu))
+        top = _scratch_vertices(gap, patch_width, conn_height, patch_clearance, size=size,  angle=_angle)
+        bot = _scratch_vertices(gap, patch_width, conn_height, patch_clearance, size=size,  angle=_angle-(_inner_angle),rot=2)
+        offsets_top = np.stack([np.full_like(dy_arr, center.x), dy_arr], axis=-1)[:, None, :]
+        offsets_bot = np.stack([np.full_like(dy_arr, center.x), -dy_arr], axis=-1)[:, None, :]
+        vertices = np.concatenate([top[None] + offsets_top, bot[None] + offsets_bot])
     else:
         bottom_angle = _angle - _inner_angle
         # Both anchor at the gap edge now, so the span is simply conn_height -
         # no more sin/cos cancellation needed to offset the connector tip's angle.
         top_height = conn_height
         bot_height = conn_height
-        patches = [pya.DTrans(0,False,center.x, center.y) * (
-                    patch_points(heigth=top_height, size=size, angle=_angle, direction=1, finger_overlap=finger_overlap)
-                    ).to_itype(dbu),
-                    pya.DTrans(0,False,center.x, center.y) * (
-                    patch_points(heigth=bot_height, size=size, angle=bottom_angle, direction=-1, finger_overlap=finger_overlap)
-                    ).to_itype(dbu)]
+        vertices = np.array([
+            patch_points(heigth=top_height, size=size, angle=_angle, direction=1, finger_overlap=finger_overlap),
+            patch_points(heigth=bot_height, size=size, angle=bottom_angle, direction=-1, finger_overlap=finger_overlap),
+        ]) + (center.x, center.y)
+
+    patches = _to_polygons(vertices, dbu)
 
     return patches
 
@@ -165,18 +198,19 @@ def draw_patch_openning(finger_size, conn_width, heigth, angle, inner_angle, gap
         end_x = size*cos(angle)
         end_y = size*sin(angle)
         y_size = heigth+gap if direction>0 else -(heigth+gap)
-        polygon = pya.DTrans(0,False, end_x, end_y) * pya.DPolygon([
-            pya.DPoint(-conn_width/2-gap, 0),
-            pya.DPoint(-conn_width/2-gap, y_size),
-            pya.DPoint(conn_width/2+gap, y_size),
-            pya.DPoint(conn_width/2+gap, 0),
-        ])
+        vertices = np.array([
+            (-conn_width/2-gap, 0),
+            (-conn_width/2-gap, y_size),
+            (conn_width/2+gap, y_size),
+            (conn_width/2+gap, 0),
+        ]) + (end_x, end_y+fudge)
+        polygon = _to_dpolygon(vertices)
         if True:
             polygon = polygon.round_corners(round_radius, round_radius, 32)
         return polygon
 
     # Fix the patch position to account for the finger overlap, so that the patch is aligned with the lead.
     fudge = -finger_overlap if direction > 0 else finger_overlap
-    patch = pya.DTrans(0,False,0, fudge) * (patch_points(heigth=heigth, size=size,angle=_angle))
+    patch = patch_points(heigth=heigth, size=size,angle=_angle)
 
     return patch
\ No newline at end of file
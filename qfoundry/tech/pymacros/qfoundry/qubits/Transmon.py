@@ -9,14 +9,22 @@ Extras:
     - Flux cutout selector: none, left, right, both
     - Junction leads: axis-aligned or angle-matched stubs marking where a
       future Manhattan junction (see junctions/Manhattan.py) will be placed
+    - Produced shapes are cached on disk per parameter set (see cache.py),
+      so unchanged variants are replayed instead of rebuilt on reload
 """
 
 import pya
 import math
 
+from qfoundry.cache import geometry_cache, source_hash
+from qfoundry.utils import layer_registry, rounding_points, rounding_salt
+
 # Finger/center overlap (um).
 _CPW_OVERLAP = 5.0
 
+# Salts the geometry cache key so edits to this file invalidate cached variants.
+_SOURCE_HASH = source_hash(__file__)
+
 # Readout angle per island.
 _READOUT_ANGLE = {"top": 90.0, "bottom": 270.0}
 
@@ -188,7 +196,30 @@ class Transmon(pya.PCellDeclarationHelper):
     def produce_impl(self):
         dbu = self.layout.dbu
 
-        # Four mirrored coupler angles.
+        # Replay the shapes of an identical variant from the on-disk cache.
+        params = {p.name: getattr(self, p.name) for p in self.get_parameters()}
+        key = geometry_cache.key("Transmon", params, dbu, _SOURCE_HASH + rounding_salt())
+        shapes = geometry_cache.load(key)
+        if shapes is None:
+            shapes = self._produce_shapes(dbu)
+            geometry_cache.store(key, shapes)
+
+        layers = layer_registry(self.layout)
+        for layer, region in shapes.items():
+            self.cell.shapes(layers.index(layer)).insert(region)
+
+        coupler_angles, ext_list = self._coupler_layout()
+        ro_isl, ro_angles = self._readout_layout()
+        for i, angle in enumerate(coupler_angles):
+            self._port_instance(angle, self.transmon_span + ext_list[i],
+                                self.coupler_wg_width, self.coupler_wg_gap)
+        for i in range(len(ro_isl)):
+            self._port_instance(ro_angles[i],
+                                self.transmon_span + float(self.readout_extension),
+                                self.readout_wg_width, self.readout_wg_gap)
+
+    def _coupler_layout(self):
+        """Return the four mirrored coupler angles and their extensions."""
         a = float(self.coupler_angle)
         coupler_angles = [a, 180.0 - a, 180.0 + a, 360.0 - a]
 
@@ -197,9 +228,10 @@ class Transmon(pya.PCellDeclarationHelper):
                                        if self.coupler_extensions else [100.0])]
         if len(raw_ext) < 4:
             raw_ext += [raw_ext[-1]] * (4 - len(raw_ext))
-        ext_list = raw_ext[:4]
+        return coupler_angles, raw_ext[:4]
 
-        # Readout target(s).
+    def _readout_layout(self):
+        """Return the readout target island(s) and their angles."""
         ro_sel = str(self.readout_islands).strip().lower()
         if ro_sel == "none":
             ro_isl = []
@@ -209,30 +241,34 @@ class Transmon(pya.PCellDeclarationHelper):
             ro_isl = ["bottom"]
         else:
             ro_isl = ["top"]
-        ro_angles = [_READOUT_ANGLE.get(s, 90.0) for s in ro_isl]
+        return ro_isl, [_READOUT_ANGLE.get(s, 90.0) for s in ro_isl]
+
+    def _produce_shapes(self, dbu):
+        """Build the transmon geometry, returned as {LayerInfo: Region}."""
+        coupler_angles, ext_list = self._coupler_layout()
+        ro_isl, ro_angles = self._readout_layout()
         n_ro = len(ro_isl)
 
+        # Each role (fingers, CPW centers, CPW gaps, readout) is collected
+        # unmerged in one Region and merged once by the boolean using it.
+
         # Coupler fingers
         coupler_gap_dbu = int(self.coupler_gap / dbu)
         fingers = pya.Region()
-        finger_list = []
-        for angle in coupler_angles:
-            f = self._radial_finger(angle, self.coupler_wg_width, dbu)
-            fingers += f
-            finger_list.append(f)
-
-        # Raw islands, plus junction leads (individually rounded before merging).
-        raw_islands = (self._raw_island("top", dbu) +
-                       self._raw_island("bottom", dbu)).merged()
+        fingers.insert([self._radial_finger(angle, self.coupler_wg_width, dbu)
+                        for angle in coupler_angles])
+
+        # Raw islands, plus junction leads (individually rounded before merging),
+        # minus the finger clearances.
+        raw_islands = self._raw_island("top", dbu) + self._raw_island("bottom", dbu)
         if self.add_junction_leads:
-            raw_islands = (raw_islands + self._junction_leads(dbu)).merged()
-        for f in finger_list:
-            raw_islands -= f.sized(coupler_gap_dbu)
+            raw_islands += self._junction_leads(dbu)
+        raw_islands -= fingers.sized(coupler_gap_dbu)
 
         # Round island and slot corners.
         if self.corner_radius > 0.0:
             cr = int(self.corner_radius / dbu)
-            island_region = raw_islands.round_corners(cr, cr, 64)
+            island_region = raw_islands.round_corners(cr, cr, rounding_points(self.corner_radius, dbu, 64))
         else:
             island_region = raw_islands
 
@@ -243,13 +279,11 @@ class Transmon(pya.PCellDeclarationHelper):
             readout_inner += self._readout_t_coupler(ro_angles[i], ro_isl[i], dbu)
 
         cpw_centers = pya.Region()
-        for i, angle in enumerate(coupler_angles):
-            cpw_centers += self._cpw_center(angle, ext_list[i],
-                                            self.coupler_wg_width, dbu)
-        for i in range(n_ro):
-            cpw_centers += self._cpw_center(ro_angles[i],
-                                            float(self.readout_extension),
-                                            self.readout_wg_width, dbu)
+        cpw_centers.insert([self._cpw_center(angle, ext_list[i], self.coupler_wg_width, dbu)
+                            for i, angle in enumerate(coupler_angles)] +
+                           [self._cpw_center(ro_angles[i], float(self.readout_extension),
+                                             self.readout_wg_width, dbu)
+                            for i in range(n_ro)])
 
         # Final metal region.
         metal = (island_region + fingers + readout_inner + cpw_centers).merged()
@@ -262,55 +296,49 @@ class Transmon(pya.PCellDeclarationHelper):
         # Apply flux cutout before rounding.
         if self.depth_flux_cutout > 0.0:
             fs = str(self.flux_input_side).strip().lower()
-            if fs == "none":
-                pass
-            elif fs == "both":
-                keepout_core -= self._flux_cutout("left", dbu)
-                keepout_core -= self._flux_cutout("right", dbu)
-            else:
-                keepout_core -= self._flux_cutout(fs, dbu)
+            sides = {"none": [], "both": ["left", "right"]}.get(fs, [fs])
+            if sides:
+                cutouts = pya.Region()
+                for side in sides:
+                    cutouts += self._flux_cutout(side, dbu)
+                keepout_core -= cutouts
 
         # Round opening corners before adding extensions.
         if self.keepout_corner_radius > 0.0:
             kr = int(self.keepout_corner_radius / dbu)
-            keepout_core = keepout_core.round_corners(kr, kr, 64)
+            keepout_core = keepout_core.round_corners(kr, kr, rounding_points(self.keepout_corner_radius, dbu, 64))
 
         # Add CPW gap strips.
         cpw_gaps = pya.Region()
         for i, angle in enumerate(coupler_angles):
-            cpw_gaps += self._cpw_gaps(angle, ext_list[i],
-                                       self.coupler_wg_width, self.coupler_wg_gap, dbu)
+            cpw_gaps.insert(self._cpw_gaps(angle, ext_list[i],
+                                           self.coupler_wg_width, self.coupler_wg_gap, dbu))
         for i in range(n_ro):
-            cpw_gaps += self._cpw_gaps(ro_angles[i],
-                                       float(self.readout_extension),
-                                       self.readout_wg_width, self.readout_wg_gap, dbu)
+            cpw_gaps.insert(self._cpw_gaps(ro_angles[i],
+                                           float(self.readout_extension),
+                                           self.readout_wg_width, self.readout_wg_gap, dbu))
 
         keepout_base = (keepout_core + cpw_gaps).merged()
 
         # Round keepout concave corners.
         if self.keepout_corner_radius > 0.0:
             kr = int(self.keepout_corner_radius / dbu)
-            keepout_base = keepout_base.round_corners(kr, 0, 64)
-
-        # Subtract metal from keepout.
-        ground_neg = (keepout_base - metal).merged()
+            keepout_base = keepout_base.round_corners(kr, 0, rounding_points(self.keepout_corner_radius, dbu, 64))
 
-        # Write layers.
-        self.cell.shapes(self.metal_layer).insert(metal)
-        self.cell.shapes(self.metal_n_layer).insert(ground_neg)
-
-        for i, angle in enumerate(coupler_angles):
-            self._port_instance(angle, self.transmon_span + ext_list[i],
-                                self.coupler_wg_width, self.coupler_wg_gap)
-        for i in range(n_ro):
-            self._port_instance(ro_angles[i],
-                                self.transmon_span + float(self.readout_extension),
-                                self.readout_wg_width, self.readout_wg_gap)
+        # Subtract metal from keepout (boolean outputs are merged).
+        ground_neg = keepout_base - metal
 
         full = (metal + ground_neg).merged()
-        self.cell.shapes(self.devrec_layer).insert(full)
         margin_dbu = int(self.margin / dbu)
-        self.cell.shapes(self.ground_exclude_layer).insert(full.sized(margin_dbu))
+
+        # Layers may coincide, accumulate rather than overwrite.
+        shapes = {}
+        for layer, region in ((self.metal_layer, metal),
+                              (self.metal_n_layer, ground_neg),
+                              (self.devrec_layer, full),
+                              (self.ground_exclude_layer, full.sized(margin_dbu))):
+            shapes[layer] = shapes[layer] + region if layer in shapes else region
+        return shapes
 
     def _rot(self, dpoly, angle_deg):
         """Rotate a DPolygon around origin."""
@@ -453,37 +481,36 @@ class Transmon(pya.PCellDeclarationHelper):
         dpoly = dshape if isinstance(dshape, pya.DPolygon) else pya.DPolygon(dshape)
         ipoly = dpoly.to_itype(dbu)
         if rr > 0:
-            ipoly = ipoly.round_corners(rr, rr, 32)
+            ipoly = ipoly.round_corners(rr, rr, rounding_points(rr * dbu, dbu, 32))
         return pya.Region(ipoly)
 
     def _radial_finger(self, angle_deg, width, dbu):
-        """Return one rounded-tip radial finger on metal layer."""
+        """Return one rounded-tip radial finger (Polygon) on metal layer."""
         r_in = self.transmon_span - self.coupler_inclusion
         r_out = self.transmon_span + _CPW_OVERLAP
         box = pya.DBox(r_in, -width / 2.0, r_out, width / 2.0)
         ipoly = self._rot(pya.DPolygon(box), angle_deg).to_itype(dbu)
         if width > 0:
             rr = int((width / 2.0) / dbu)
-            ipoly = ipoly.round_corners(0, rr, 32)
-        return pya.Region(ipoly)
+            ipoly = ipoly.round_corners(0, rr, rounding_points(rr * dbu, dbu, 32))
+        return ipoly
 
     def _cpw_center(self, angle_deg, extension, width, dbu):
-        """Return CPW center strip on metal layer."""
+        """Return CPW center strip (Polygon) on metal layer."""
         x0 = self._cpw_inward_start()
         x1 = self.transmon_span + extension
         box = pya.DBox(x0, -width / 2.0, x1, width / 2.0)
-        return pya.Region(self._rot(pya.DPolygon(box), angle_deg).to_itype(dbu))
+        return self._rot(pya.DPolygon(box), angle_deg).to_itype(dbu)
 
     def _cpw_gaps(self, angle_deg, extension, center_width, gap_width, dbu):
-        """Return the two CPW gap strips on keepout layer."""
+        """Return the two (disjoint) CPW gap strips on keepout layer as Polygons."""
         hw = center_width / 2.0
         x0 = self._cpw_inward_start()
         x1 = self.transmon_span + extension
         top_gap = pya.DBox(x0, hw, x1, hw + gap_width)
         bot_gap = pya.DBox(x0, -hw - gap_width, x1, -hw)
-        r_top = pya.Region(self._rot(pya.DPolygon(top_gap), angle_deg).to_itype(dbu))
-        r_bot = pya.Region(self._rot(pya.DPolygon(bot_gap), angle_deg).to_itype(dbu))
-        return (r_top + r_bot).merged()
+        return [self._rot(pya.DPolygon(top_gap), angle_deg).to_itype(dbu),
+                self._rot(pya.DPolygon(bot_gap), angle_deg).to_itype(dbu)]
 
     def _cpw_inward_start(self):
         """Midpoint between island outer edge and keepout radius."""
@@ -577,7 +604,7 @@ class Transmon(pya.PCellDeclarationHelper):
         tcoupler = (r_stem + r_tbar).merged()
         if self.corner_radius > 0.0:
             cr = int(self.corner_radius / dbu)
-            tcoupler = tcoupler.round_corners(cr, cr, 32)
+            tcoupler = tcoupler.round_corners(cr, cr, rounding_points(self.corner_radius, dbu, 32))
         return tcoupler
 
     def _ray_island_entry(self, cos_a, sin_a, x_half, y_lo, y_hi):
@@ -18,6 +18,8 @@ Date: 2026
 import pya
 import math
 
+from qfoundry.utils import rounding_points
+
 
 class TransmonStar(pya.PCellDeclarationHelper):
     """Parametric cell for a star-shaped transmon qubit.
@@ -347,7 +349,7 @@ class TransmonStar(pya.PCellDeclarationHelper):
         
         # Extract merged polygon and apply rounding
         polygon = region.merged()
-        return polygon.round_corners(radius_dbu, radius_dbu, 32)
+        return polygon.round_corners(radius_dbu, radius_dbu, rounding_points(self.corner_radius, dbu, 32))
     
     def _make_junction_connectors(self, angle_deg): # NOT IMPLEMENTED
         """
@@ -438,9 +440,10 @@ class TransmonStar(pya.PCellDeclarationHelper):
         
         # Apply rounding
         if isinstance(radius_dbu, tuple):
-            return region.merged().round_corners(radius_dbu[0], radius_dbu[1], 32)
+            n = rounding_points(max(radius), dbu, 32)
+            return region.merged().round_corners(radius_dbu[0], radius_dbu[1], n)
         else:
-            return region.merged().round_corners(radius_dbu, radius_dbu, 32)
+            return region.merged().round_corners(radius_dbu, radius_dbu, rounding_points(radius, dbu, 32))
     
     def _make_connector_waveguide(self, angle_deg, connector_length, gap=0):
         """Create rectangular waveguide extension for connector.
@@ -1,4 +1,4 @@
 
 # Enter your Python code here
 
-from qfoundry.scripts.library import reload_library
\ No newline at end of file
+from qfoundry.scripts.library import reload_library, load_library
\ No newline at end of file
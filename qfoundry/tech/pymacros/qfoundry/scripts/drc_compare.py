@@ -0,0 +1,123 @@
+# Compare two DRC report databases (.lyrdb) category by category.
+#
+# Used as the regression check of the execution modes of the QFoundry DRC decks:
+# a deep (hierarchical) report stores each violation once per cell, so every item
+# is first flattened to top cell coordinates through the cell references of the
+# report. Polygon results are compared by area (XOR), edge pair and edge results
+# as multisets of normalized, dbu-rounded geometries.
+#
+# Usage:
+#   klayout -b -r drc_modular.lydrc -rd input=chip.gds -rd report=flat.lyrdb
+#   klayout -b -r drc_modular.lydrc -rd input=chip.gds -rd report=deep.lyrdb -rd drc_mode=deep
+#   python drc_compare.py flat.lyrdb deep.lyrdb
+
+import pya
+import sys
+from collections import Counter
+
+
+def top_transformations(rdb, cell_id, cache):
+    """All transformations from the cell with cell_id to the top cell of the report."""
+    if cell_id not in cache:
+        cell = rdb.cell_by_id(cell_id)
+        references = list(cell.each_reference()) if cell is not None else []
+        if not references:
+            cache[cell_id] = [pya.DCplxTrans()]
+        else:
+            cache[cell_id] = [parent_trans * reference.trans
+                              for reference in references
+                              for parent_trans in top_transformations(rdb, reference.parent_cell_id, cache)]
+    return cache[cell_id]
+
+
+def each_category(rdb):
+    """Every category of the report, sub-categories included."""
+    categories = list(rdb.each_category())
+    while categories:
+        category = categories.pop(0)
+        yield category
+        categories += list(category.each_sub_category())
+
+
+def flat_results(rdb, dbu=0.001):
+    """
+    Flatten a report database.
+
+    Returns:
+        dict: category path -> {"items": flat item count, "region": pya.Region,
+              "edge_pairs": Counter, "edges": Counter}
+    """
+    cache = {}
+    results = {}
+    for category in each_category(rdb):
+        result = {"items": 0, "region": pya.Region(), "edge_pairs": Counter(), "edges": Counter()}
+        for item in rdb.each_item_per_category(category.rdb_id()):
+            for trans in top_transformations(rdb, item.cell_id(), cache):
+                result["items"] += 1
+                for value in item.each_value():
+                    if value.is_polygon():
+                        result["region"].insert((trans * value.polygon).to_itype(dbu))
+                    elif value.is_box():
+                        result["region"].insert((trans * pya.DPolygon(value.box)).to_itype(dbu))
+                    elif value.is_edge_pair():
+                        result["edge_pairs"][(trans * value.edge_pair).normalized().to_itype(dbu).to_s()] += 1
+                    elif value.is_edge():
+                        result["edges"][(trans * value.edge).to_itype(dbu).to_s()] += 1
+        results[category.path()] = result
+    return results
+
+
+def compare_reports(reference_file, candidate_file, dbu=0.001):
+    """
+    Compare two report databases.
+
+    Args:
+        reference_file (str): Report of the reference run (usually flat).
+        candidate_file (str): Report of the run under test (tiled, deep, ...).
+        dbu (float): Grid the geometries are rounded to before comparing.
+
+    Returns:
+        list[tuple]: (category, reference items, candidate items, differences) per category,
+        differences is an empty string when both runs agree.
+    """
+    reports = []
+    for file_name in (reference_file, candidate_file):
+        rdb = pya.ReportDatabase("")
+        rdb.load(file_name)
+        reports.append(flat_results(rdb, dbu))
+    reference, candidate = reports
+
+    rows = []
+    empty = {"items": 0, "region": pya.Region(), "edge_pairs": Counter(), "edges": Counter()}
+    for path in list(reference) + [p for p in candidate if p not in reference]:
+        a = reference.get(path, empty)
+        b = candidate.get(path, empty)
+        differences = []
+        xor = a["region"] ^ b["region"]
+        if not xor.is_empty():
+            differences.append(f"polygon area differs by {xor.area() * dbu * dbu:.4g} um2")
+        if a["edge_pairs"] != b["edge_pairs"]:
+            differences.append(f"{sum(((a['edge_pairs'] - b['edge_pairs']) + (b['edge_pairs'] - a['edge_pairs'])).values())} edge pairs differ")
+        if a["edges"] != b["edges"]:
+            differences.append(f"{sum(((a['edges'] - b['edges']) + (b['edges'] - a['edges'])).values())} edges differ")
+        rows.append((path, a["items"], b["items"], ", ".join(differences)))
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Compare two DRC report databases (e.g. flat vs deep run).")
+    parser.add_argument("reference", help="Reference .lyrdb (flat run)")
+    parser.add_argument("candidate", help=".lyrdb to check against the reference")
+    parser.add_argument("--dbu", type=float, default=0.001)
+    args = parser.parse_args()
+
+    rows = compare_reports(args.reference, args.candidate, args.dbu)
+    width = max([len(path) for path, *_ in rows] + [8])
+    print(f"{'Category':<{width}}  {'Reference':>9}  {'Candidate':>9}  Result")
+    for path, n_reference, n_candidate, differences in rows:
+        print(f"{path:<{width}}  {n_reference:>9}  {n_candidate:>9}  {differences or 'identical'}")
+
+    mismatches = [row for row in rows if row[3]]
+    print(f"{len(rows) - len(mismatches)}/{len(rows)} categories identical")
+    sys.exit(1 if mismatches else 0)
@@ -0,0 +1,327 @@
+# Incremental DRC: recheck only the cells that changed since the previous run.
+#
+# A fingerprint file stored next to the layout (<layout>.drcfp.json) records, for
+# every cell, a hash of its own shapes (per layer) and child instances, and the
+# boxes (top cell coordinates) where the cell is placed. On the next run:
+#   - cells whose hash changed, and new or deleted cells, are dirty
+#   - the dirty windows are their old and new placement boxes, grown to cover the
+#     writefields they touch (whole-polygon writefield rules) and then by the halo
+#   - the DRC deck runs in batch mode on the layout clipped to those windows
+#   - the previous report keeps its items outside the dirty windows, and the new
+#     run contributes the items inside them. Items in the halo band come from the
+#     previous report, so clipping artefacts there are discarded.
+# A full run is made when there is no usable previous run, the deck (or a file it
+# evals, such as drc_config.lydrc) or the halo changed, or the dirty windows cover
+# more than FULL_RUN_FRACTION of the layout.
+#
+# The halo must be at least the largest interaction distance of the deck.
+#
+# Usage:
+#   python drc_incremental.py chip.gds [--report chip.lyrdb] [--deck drc_modular.lydrc] [--halo 10] [--full]
+
+import pya
+import os
+import re
+import json
+import hashlib
+import shutil
+import subprocess
+import tempfile
+
+from qfoundry.scripts.drc_compare import top_transformations, each_category
+
+DRC_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "..", "..", "drc"))
+DEFAULT_DECK = os.path.join(DRC_DIR, "drc_modular.lydrc")
+FINGERPRINT_VERSION = 1
+WRITEFIELD_LAYER = pya.LayerInfo(98, 0)
+# Above this fraction of the layout area the incremental run is not worth it
+FULL_RUN_FRACTION = 0.5
+
+
+def fingerprint_path(layout_file):
+    return layout_file + ".drcfp.json"
+
+
+# Files a deck evals next to itself, e.g. eval(File.read(File.join(File.dirname(__FILE__), "drc_config.lydrc")))
+_DECK_INCLUDE = re.compile(r'File\.join\(\s*File\.dirname\(\s*__FILE__\s*\)\s*,\s*"([^"]+)"\s*\)')
+
+
+def deck_hash(deck):
+    """Hash of the deck and of every file it evals next to itself (rule values, shared helpers), recursively."""
+    digest = hashlib.sha1()
+    pending, seen = [os.path.realpath(deck)], set()
+    while pending:
+        file_path = pending.pop(0)
+        if file_path in seen:
+            continue
+        seen.add(file_path)
+        with open(file_path, "rb") as f:
+            content = f.read()
+        digest.update(os.path.basename(file_path).encode("utf-8") + b"\0" + content)
+        pending += [os.path.join(os.path.dirname(file_path), name)
+                    for name in _DECK_INCLUDE.findall(content.decode("utf-8", "replace"))]
+    return digest.hexdigest()
+
+
+def _box_list(box):
+    return [box.left, box.bottom, box.right, box.top]
+
+
+def cell_hash(layout, cell):
+    """Hash of the cell's own content: shapes per layer and child instances (not the children's content)."""
+    digest = hashlib.sha1()
+    for layer_index in sorted(layout.layer_indexes(), key=lambda index: layout.get_info(index).to_s()):
+        shapes = cell.shapes(layer_index)
+        if shapes.is_empty():
+            continue
+        digest.update(layout.get_info(layer_index).to_s().encode("utf-8"))
+        for shape in sorted(shape.to_s() for shape in shapes.each()):
+            digest.update(shape.encode("utf-8"))
+    instances = []
+    for instance in cell.each_inst():
+        cell_inst = instance.cell_inst
+        array = f" {cell_inst.a} {cell_inst.b} {cell_inst.na} {cell_inst.nb}" if cell_inst.is_regular_array() else ""
+        instances.append(f"{instance.cell.name} {cell_inst.cplx_trans}{array}")
+    for instance in sorted(instances):
+        digest.update(instance.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def placement_boxes(layout, top_cell):
+    """
+    Boxes covered by every cell placement, in top cell database units.
+
+    Returns:
+        dict: cell name -> [[left, bottom, right, top], ...]
+    """
+    boxes = {top_cell.name: [_box_list(top_cell.bbox())]}
+    iterator = top_cell.begin_instances_rec()
+    while not iterator.at_end():
+        cell = iterator.inst_cell()
+        box = cell.bbox().transformed(iterator.trans() * iterator.inst_trans())
+        boxes.setdefault(cell.name, []).append(_box_list(box))
+        iterator.next()
+    return boxes
+
+
+def layout_fingerprint(layout, top_cell):
+    """Per-cell content hashes and placement boxes of the hierarchy below top_cell."""
+    cells = [top_cell] + [layout.cell(cell_index) for cell_index in top_cell.called_cells()]
+    return {
+        "dbu": layout.dbu,
+        "top": top_cell.name,
+        "hashes": {cell.name: cell_hash(layout, cell) for cell in cells},
+        "boxes": placement_boxes(layout, top_cell),
+    }
+
+
+def dirty_region(previous, current):
+    """
+    Region (database units) touched by the cells that changed between two fingerprints.
+
+    Both the old placements (content removed) and the new ones (content added) are dirty.
+    """
+    region = pya.Region()
+    for name in set(previous["hashes"]) | set(current["hashes"]):
+        if previous["hashes"].get(name) == current["hashes"].get(name):
+            continue
+        for box in previous["boxes"].get(name, []) + current["boxes"].get(name, []):
+            region.insert(pya.Box(*box))
+    return region.merged()
+
+
+def check_windows(layout, top_cell, dirty, halo):
+    """
+    Windows to rerun the deck on: the dirty region grown to the writefields it touches, then by the halo.
+
+    Returns:
+        list[pya.Box]: Non-overlapping windows in database units.
+    """
+    windows = pya.Region(dirty)
+    writefield_layer = layout.find_layer(WRITEFIELD_LAYER)
+    if writefield_layer is not None:
+        writefields = pya.Region(top_cell.begin_shapes_rec(writefield_layer))
+        windows = (windows + writefields.interacting(windows)).merged()
+    windows = windows.sized(int(round(halo / layout.dbu)))
+
+    # Clip windows must not overlap, otherwise shapes would be checked twice
+    boxes = [polygon.bbox() for polygon in windows.merged().each()]
+    while True:
+        merged = pya.Region()
+        for box in boxes:
+            merged.insert(box)
+        merged_boxes = [polygon.bbox() for polygon in merged.merged().each()]
+        if len(merged_boxes) == len(boxes):
+            return merged_boxes
+        boxes = merged_boxes
+
+
+def run_deck(deck, layout_file, report_file, klayout="klayout", defines=None):
+    """Run a DRC deck in KLayout batch mode on layout_file, writing report_file."""
+    command = [klayout, "-b", "-r", deck, "-rd", f"input={layout_file}", "-rd", f"report={report_file}"]
+    for name, value in (defines or {}).items():
+        command += ["-rd", f"{name}={value}"]
+    subprocess.run(command, check=True)
+
+
+def write_clipped_layout(layout, top_cell, windows, file_path):
+    """Write the content of top_cell inside the windows to a new layout (same coordinates)."""
+    target = pya.Layout()
+    target.dbu = layout.dbu
+    clip_cells = layout.multi_clip_into(top_cell.cell_index(), target, windows)
+    clip_top = target.create_cell(top_cell.name + "_INCREMENTAL")
+    for cell_index in clip_cells:
+        clip_top.insert(pya.CellInstArray(cell_index, pya.Trans()))
+    target.write(file_path)
+
+
+def flat_items(rdb):
+    """Yield (category, [values in top cell coordinates]) for every item of a report."""
+    cache = {}
+    for category in each_category(rdb):
+        for item in rdb.each_item_per_category(category.rdb_id()):
+            for trans in top_transformations(rdb, item.cell_id(), cache):
+                values = []
+                for value in item.each_value():
+                    if value.is_polygon():
+                        values.append(trans * value.polygon)
+                    elif value.is_box():
+                        values.append(trans * pya.DPolygon(value.box))
+                    elif value.is_edge_pair():
+                        values.append(trans * value.edge_pair)
+                    elif value.is_edge():
+                        values.append(trans * value.edge)
+                    elif value.is_string():
+                        values.append(value.string)
+                yield category, values
+
+
+def _touches(values, windows):
+    for value in values:
+        if isinstance(value, str):
+            continue
+        box = value.bbox()
+        if any(box.touches(window) for window in windows):
+            return True
+    return False
+
+
+def merge_reports(previous_file, partial_file, windows, output_file, top_name="TOP"):
+    """
+    Merge the previous report with a partial run.
+
+    Args:
+        previous_file (str): Report of the previous (full or merged) run.
+        partial_file (str): Report of the run on the clipped layout.
+        windows (list[pya.DBox]): Dirty windows (without halo) in μm.
+        output_file (str): Merged report.
+
+    Returns:
+        int: Number of items in the merged report.
+    """
+    previous = pya.ReportDatabase("")
+    previous.load(previous_file)
+    partial = pya.ReportDatabase("")
+    partial.load(partial_file)
+
+    merged = pya.ReportDatabase(partial.description)
+    merged.generator = partial.generator
+    merged.original_file = partial.original_file
+    cell = merged.create_cell(top_name)
+    categories = {}
+    n_items = 0
+
+    # Previous items outside the dirty windows, new items inside them
+    for rdb, keep_inside in ((previous, False), (partial, True)):
+        for category, values in flat_items(rdb):
+            if _touches(values, windows) != keep_inside:
+                continue
+            if category.path() not in categories:
+                new_category = merged.create_category(category.path())
+                new_category.description = category.description
+                categories[category.path()] = new_category
+            item = merged.create_item(cell.rdb_id(), categories[category.path()].rdb_id())
+            for value in values:
+                item.add_value(value)
+            n_items += 1
+
+    merged.save(output_file)
+    return n_items
+
+
+def incremental_drc(layout_file, report_file=None, deck=DEFAULT_DECK, halo=10.0, klayout="klayout", full=False):
+    """
+    Run the DRC deck on layout_file, rechecking only what changed since the previous run.
+
+    Args:
+        layout_file (str): GDS/OASIS file to check.
+        report_file (str): Report database, updated in place. Defaults to <layout>.lyrdb.
+        deck (str): DRC deck (.lydrc).
+        halo (float): Interaction distance around the dirty cells in μm.
+        klayout (str): KLayout executable used for the batch runs.
+        full (bool): Force a full run.
+
+    Returns:
+        str: "full", "incremental" or "unchanged".
+    """
+    report_file = report_file or os.path.splitext(layout_file)[0] + ".lyrdb"
+    layout = pya.Layout()
+    layout.read(layout_file)
+    top_cell = layout.top_cell()
+    current = layout_fingerprint(layout, top_cell)
+    current.update({"version": FINGERPRINT_VERSION, "deck": deck_hash(deck), "halo": halo})
+
+    previous = None
+    try:
+        with open(fingerprint_path(layout_file)) as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    usable = (not full and previous is not None and os.path.exists(report_file)
+              and all(previous.get(key) == current[key] for key in ("version", "deck", "halo", "dbu", "top")))
+
+    mode = "full"
+    if usable:
+        dirty = dirty_region(previous, current)
+        if dirty.is_empty():
+            print("No cell changed since the previous DRC run, report is up to date")
+            return "unchanged"
+        windows = check_windows(layout, top_cell, dirty, halo)
+        covered = sum(window.area() for window in windows)
+        if covered < FULL_RUN_FRACTION * top_cell.bbox().area():
+            print(f"Rechecking {len(windows)} window(s), {100.0 * covered / top_cell.bbox().area():.1f}% of the layout")
+            work_dir = tempfile.mkdtemp(prefix="qfoundry_drc_")
+            try:
+                clipped_file = os.path.join(work_dir, "clipped.oas")
+                partial_report = os.path.join(work_dir, "partial.lyrdb")
+                write_clipped_layout(layout, top_cell, windows, clipped_file)
+                run_deck(deck, clipped_file, partial_report, klayout)
+                # Items from the partial run are kept inside the dirty region only (not in the halo band)
+                dirty_windows = [polygon.bbox().to_dtype(layout.dbu) for polygon in dirty.each()]
+                merge_reports(report_file, partial_report, dirty_windows, report_file, top_cell.name)
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            mode = "incremental"
+
+    if mode == "full":
+        print("Full DRC run")
+        run_deck(deck, layout_file, report_file, klayout)
+
+    with open(fingerprint_path(layout_file), "w") as f:
+        json.dump(current, f)
+    return mode
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Incremental DRC: recheck only the cells changed since the previous run.")
+    parser.add_argument("layout", help="GDS/OASIS file to check")
+    parser.add_argument("--report", default=None, help="Report database (default: <layout>.lyrdb)")
+    parser.add_argument("--deck", default=DEFAULT_DECK)
+    parser.add_argument("--halo", type=float, default=10.0, help="Interaction distance in um (>= largest rule distance)")
+    parser.add_argument("--klayout", default="klayout", help="KLayout executable")
+    parser.add_argument("--full", action="store_true", help="Force a full run")
+    args = parser.parse_args()
+
+    incremental_drc(args.layout, args.report, args.deck, args.halo, args.klayout, args.full)
@@ -0,0 +1,148 @@
+# Headless DRC runner: run a QFoundry DRC deck in KLayout batch mode and write a
+# machine-readable JSON summary next to the report database.
+#
+# The deck writes its per-rule statistics (wall-clock time, process memory after
+# the rule, violation count) to a temporary file given with "-rd stats=<file>".
+# The runner adds the total wall time, the peak memory of the KLayout process and
+# the item count per report category, read back from the .lyrdb. Decks without
+# per-rule statistics only get the category counts.
+#
+# For input polygon/edge counts per rule and the heaviest cells, add the profile
+# report of the decks: -D profile=chip.profile.txt
+#
+# The exit code gates a pipeline: 0 when the violation count is within
+# --max-violations (default 0), 1 otherwise, 2 when the deck itself failed.
+#
+# Usage:
+#   python drc_runner.py chip.gds [--deck drc_modular.lydrc] [--report chip.lyrdb] [--summary chip.json]
+#                                 [--max-violations 0] [-D drc_mode=deep]
+
+import pya
+import ast
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+from qfoundry.scripts.drc_compare import each_category
+from qfoundry.scripts.drc_incremental import DEFAULT_DECK, DRC_DIR
+
+SUMMARY_VERSION = 1
+
+
+def warning_categories(file_path=os.path.join(DRC_DIR, "drc_config.lydrc")):
+    """Report categories that are warnings, not counted as violations: WARNING_ERRORS of drc_config.lydrc."""
+    with open(file_path) as f:
+        match = re.search(r"^WARNING_ERRORS\s*=\s*(\[[^\]]*\])", f.read(), re.MULTILINE)
+    if match is None:
+        raise ValueError(f"{file_path} does not define WARNING_ERRORS")
+    return set(ast.literal_eval(match.group(1)))
+
+
+def peak_child_memory_mb():
+    """Peak resident memory of the terminated child processes, None where not available (Windows)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return round(peak / (1048576.0 if sys.platform == "darwin" else 1024.0), 1)
+
+
+def category_counts(report_file):
+    """Item count per category path of a report database."""
+    rdb = pya.ReportDatabase("")
+    rdb.load(report_file)
+    return {category.path(): category.num_items() for category in each_category(rdb)}
+
+
+def run_drc(layout_file, deck=DEFAULT_DECK, report_file=None, summary_file=None, klayout="klayout", defines=None):
+    """
+    Run a DRC deck in batch mode and write the JSON summary.
+
+    Args:
+        layout_file (str): GDS/OASIS file to check.
+        deck (str): DRC deck (.lydrc).
+        report_file (str): Report database. Defaults to <layout>.lyrdb.
+        summary_file (str): JSON summary. Defaults to the report file with a .json extension.
+        klayout (str): KLayout executable.
+        defines (dict): Additional "-rd" variables of the deck (e.g. {"drc_mode": "deep"}).
+
+    Returns:
+        dict: The summary written to summary_file.
+    """
+    report_file = report_file or os.path.splitext(layout_file)[0] + ".lyrdb"
+    summary_file = summary_file or os.path.splitext(report_file)[0] + ".json"
+
+    work_dir = tempfile.mkdtemp(prefix="qfoundry_drc_")
+    try:
+        stats_file = os.path.join(work_dir, "rule_stats.json")
+        command = [klayout, "-b", "-r", deck, "-rd", f"input={layout_file}", "-rd", f"report={report_file}",
+                   "-rd", f"stats={stats_file}"]
+        for name, value in (defines or {}).items():
+            command += ["-rd", f"{name}={value}"]
+
+        start = time.perf_counter()
+        returncode = subprocess.run(command).returncode
+        wall_time = time.perf_counter() - start
+
+        rules = []
+        try:
+            with open(stats_file) as f:
+                rules = json.load(f)
+        except (OSError, ValueError):
+            pass
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    categories = category_counts(report_file) if returncode == 0 and os.path.exists(report_file) else {}
+    warnings = warning_categories()
+    summary = {
+        "version": SUMMARY_VERSION,
+        "layout": os.path.abspath(layout_file),
+        "deck": os.path.abspath(deck),
+        "report": os.path.abspath(report_file),
+        "defines": defines or {},
+        "returncode": returncode,
+        "seconds": round(wall_time, 3),
+        "peak_memory_mb": peak_child_memory_mb(),
+        "violations": sum(count for path, count in categories.items() if path not in warnings),
+        # Slowest rules first
+        "rules": sorted(rules, key=lambda rule: rule["seconds"], reverse=True),
+        "categories": categories,
+    }
+    with open(summary_file, "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a DRC deck in batch mode and write a JSON summary next to the report.")
+    parser.add_argument("layout", help="GDS/OASIS file to check")
+    parser.add_argument("--deck", default=DEFAULT_DECK)
+    parser.add_argument("--report", default=None, help="Report database (default: <layout>.lyrdb)")
+    parser.add_argument("--summary", default=None, help="JSON summary (default: <report>.json)")
+    parser.add_argument("--klayout", default="klayout", help="KLayout executable")
+    parser.add_argument("--max-violations", type=int, default=0, help="Fail when the report has more violations")
+    parser.add_argument("-D", "--define", action="append", default=[], metavar="NAME=VALUE",
+                        help="Additional deck variable, e.g. -D drc_mode=deep")
+    args = parser.parse_args()
+
+    defines = dict(define.split("=", 1) for define in args.define)
+    summary = run_drc(args.layout, args.deck, args.report, args.summary, args.klayout, defines)
+
+    for rule in summary["rules"]:
+        violations = "-" if rule["violations"] is None else rule["violations"]
+        print(f"{rule['rule']:<36} {rule['seconds']:9.3f} s {rule['memory_mb']:9.1f} MB {violations:>8}")
+    print(f"Total: {summary['seconds']:.1f} s, {summary['violations']} violations, summary in "
+          f"{args.summary or os.path.splitext(summary['report'])[0] + '.json'}")
+
+    if summary["returncode"] != 0:
+        sys.exit(2)
+    sys.exit(1 if summary["violations"] > args.max_violations else 0)
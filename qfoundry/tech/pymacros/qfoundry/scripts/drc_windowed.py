@@ -0,0 +1,231 @@
+# Windowed DRC for layouts too large to flatten at once (full wafers).
+#
+# The layout is read hierarchically (never flattened here) and cut into regions
+# of interest:
+#   - chips:       the placements of the chip frame cells (FrameQF5, FrameQF10)
+#   - writefields: the EBL writefields on layer 98/0, each writefield polygon on its own
+#   - grid:        a regular grid of --window-size tiles over the layout
+#   - explicit boxes given with --window left,bottom,right,top (μm)
+# Each window is clipped out with a halo of --halo μm around it and checked by the
+# DRC deck in its own KLayout batch process, so the deck only ever flattens one
+# window and the peak memory follows the largest window, not the wafer.
+#
+# The window reports are stitched into one report: an item is kept from the
+# window whose core (without halo) contains the center of the item's bounding box,
+# and only from the first such window, so items found in the overlapping halos are
+# reported once and clipping artefacts in the halo band are dropped.
+#
+# Areas of the layout outside every window (dicing lanes and wafer marks between
+# chip frames) are not checked. The run fails when the windows leave any part of
+# the layout uncovered, unless --allow-uncovered is given.
+#
+# The halo must be at least the largest interaction distance of the deck. Rules on
+# whole polygons (writefield sizes, pad coverage) see the polygons cut at the
+# halo edge: use writefield windows, or windows that contain those polygons whole.
+#
+# Usage:
+#   python drc_windowed.py wafer.gds [--windows chips|writefields|grid] [--window 0,0,5000,5000]
+#                          [--window-size 5000] [--halo 10] [--jobs 2] [--report wafer.lyrdb]
+#                          [--deck drc_modular.lydrc] [-D drc_mode=deep] [--allow-uncovered]
+
+import pya
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from qfoundry.scripts.drc_compare import each_category
+from qfoundry.scripts.drc_incremental import DEFAULT_DECK, WRITEFIELD_LAYER, flat_items, run_deck
+from qfoundry.scripts.drc_runner import peak_child_memory_mb
+
+# Cell names (without the "$n" variant suffix) of the chip frames used as windows
+CHIP_CELLS = ("FrameQF5", "FrameQF10")
+
+
+def chip_windows(layout, top_cell, cell_names=CHIP_CELLS):
+    """Boxes (database units) of every placement of the chip frame cells below top_cell."""
+    windows = []
+    iterator = top_cell.begin_instances_rec()
+    while not iterator.at_end():
+        cell = iterator.inst_cell()
+        if cell.name.split("$")[0] in cell_names:
+            windows.append(cell.bbox().transformed(iterator.trans() * iterator.inst_trans()))
+        iterator.next()
+    return windows
+
+
+def writefield_windows(layout, top_cell):
+    """Bounding boxes (database units) of the writefields of layer 98/0, one per writefield polygon."""
+    writefield_layer = layout.find_layer(WRITEFIELD_LAYER)
+    if writefield_layer is None:
+        return []
+    # Not merged: abutting writefields (the normal tiling) must stay separate windows
+    writefields = pya.Region(top_cell.begin_shapes_rec(writefield_layer))
+    writefields.merged_semantics = False
+    return [polygon.bbox() for polygon in writefields.each()]
+
+
+def grid_windows(top_cell, size, dbu):
+    """Regular grid of size x size μm windows covering the bounding box of top_cell."""
+    bbox = top_cell.bbox()
+    step = int(round(size / dbu))
+    return [pya.Box(x, y, min(x + step, bbox.right), min(y + step, bbox.top))
+            for x in range(bbox.left, bbox.right, step)
+            for y in range(bbox.bottom, bbox.top, step)]
+
+
+def write_window(layout, top_cell, window, file_path):
+    """Write the content of top_cell inside window to a new layout (same coordinates)."""
+    target = pya.Layout()
+    target.dbu = layout.dbu
+    clip_cell = layout.clip_into(top_cell.cell_index(), target, window)
+    target.cell(clip_cell).name = top_cell.name
+    target.write(file_path)
+
+
+def _item_center(values):
+    box = pya.DBox()
+    for value in values:
+        if not isinstance(value, str):
+            box += value.bbox()
+    return box.center() if not box.empty() else None
+
+
+def stitch_reports(window_reports, cores, output_file, top_name="TOP"):
+    """
+    Stitch the reports of the windows into one report.
+
+    Args:
+        window_reports (list[str]): Report of each window, in window order.
+        cores (list[pya.DBox]): Window of each report without the halo, in μm.
+        output_file (str): Stitched report.
+
+    Returns:
+        int: Number of items in the stitched report.
+    """
+    stitched = None
+    categories = {}
+    n_items = 0
+    for index, (report_file, core) in enumerate(zip(window_reports, cores)):
+        rdb = pya.ReportDatabase("")
+        rdb.load(report_file)
+        if stitched is None:
+            stitched = pya.ReportDatabase(rdb.description)
+            stitched.generator = rdb.generator
+            cell = stitched.create_cell(top_name)
+        # Categories of the deck, also those without items
+        for category in each_category(rdb):
+            if category.path() not in categories:
+                new_category = stitched.create_category(category.path())
+                new_category.description = category.description
+                categories[category.path()] = new_category
+        for category, values in flat_items(rdb):
+            center = _item_center(values)
+            if center is None or not core.contains(center):
+                continue
+            # Owned by the first window containing it
+            if any(earlier.contains(center) for earlier in cores[:index]):
+                continue
+            item = stitched.create_item(cell.rdb_id(), categories[category.path()].rdb_id())
+            for value in values:
+                item.add_value(value)
+            n_items += 1
+    (stitched or pya.ReportDatabase("Windowed DRC")).save(output_file)
+    return n_items
+
+
+def windowed_drc(layout_file, report_file=None, deck=DEFAULT_DECK, windows="chips", halo=10.0, window_size=5000.0,
+                 klayout="klayout", defines=None, jobs=1, allow_uncovered=False):
+    """
+    Run the DRC deck window by window and stitch the results into one report.
+
+    Args:
+        layout_file (str): GDS/OASIS file to check.
+        report_file (str): Stitched report database. Defaults to <layout>.lyrdb.
+        deck (str): DRC deck (.lydrc).
+        windows (str or list[pya.DBox]): "chips", "writefields", "grid" or explicit windows in μm.
+        halo (float): Interaction distance around each window in μm.
+        window_size (float): Window size of the "grid" windows in μm.
+        klayout (str): KLayout executable used for the batch runs.
+        defines (dict): Additional "-rd" variables of the deck.
+        jobs (int): Windows checked at the same time (peak memory grows with it).
+        allow_uncovered (bool): Only warn, instead of failing, when the windows leave parts of the layout unchecked.
+
+    Returns:
+        int: Number of items in the stitched report.
+    """
+    report_file = report_file or os.path.splitext(layout_file)[0] + ".lyrdb"
+    layout = pya.Layout()
+    layout.read(layout_file)
+    top_cell = layout.top_cell()
+    dbu = layout.dbu
+
+    if windows == "chips":
+        boxes = chip_windows(layout, top_cell)
+    elif windows == "writefields":
+        boxes = writefield_windows(layout, top_cell)
+    elif windows == "grid":
+        boxes = grid_windows(top_cell, window_size, dbu)
+    else:
+        boxes = [window.to_itype(dbu) for window in windows]
+    if not boxes:
+        raise ValueError(f"No {windows} windows found in {layout_file}")
+
+    covered = pya.Region()
+    for box in boxes:
+        covered.insert(box)
+    uncovered = (pya.Region(top_cell.bbox()) - covered).area()
+    if uncovered:
+        message = f"{100.0 * uncovered / top_cell.bbox().area():.1f}% of the layout is outside the {windows} windows"
+        if not allow_uncovered:
+            raise ValueError(f"{message} and would not be checked, use grid windows or allow_uncovered")
+        print(f"Warning: {message}, it is not checked")
+
+    halo_dbu = int(round(halo / dbu))
+    work_dir = tempfile.mkdtemp(prefix="qfoundry_drc_")
+    try:
+        # Clip sequentially (one window layout in memory at a time), run the deck in parallel
+        window_files, window_reports = [], []
+        for index, box in enumerate(boxes):
+            window_files.append(os.path.join(work_dir, f"window_{index}.oas"))
+            window_reports.append(os.path.join(work_dir, f"window_{index}.lyrdb"))
+            write_window(layout, top_cell, box.enlarged(halo_dbu, halo_dbu), window_files[-1])
+        print(f"Checking {len(boxes)} {windows if isinstance(windows, str) else 'explicit'} window(s) "
+              f"with a {halo} um halo")
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            list(executor.map(lambda files: run_deck(deck, files[0], files[1], klayout, defines),
+                              zip(window_files, window_reports)))
+
+        n_items = stitch_reports(window_reports, [box.to_dtype(dbu) for box in boxes], report_file, top_cell.name)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    peak = peak_child_memory_mb()
+    print(f"{n_items} items in {report_file}" + (f", peak window memory {peak} MB" if peak is not None else ""))
+    return n_items
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Windowed DRC: check a large layout window by window.")
+    parser.add_argument("layout", help="GDS/OASIS file to check")
+    parser.add_argument("--report", default=None, help="Stitched report database (default: <layout>.lyrdb)")
+    parser.add_argument("--deck", default=DEFAULT_DECK)
+    parser.add_argument("--windows", choices=["chips", "writefields", "grid"], default="chips",
+                        help="Region of interest source (ignored with --window)")
+    parser.add_argument("--window", action="append", default=[], metavar="L,B,R,T",
+                        help="Explicit window in um, may be repeated")
+    parser.add_argument("--window-size", type=float, default=5000.0, help="Size of the grid windows in um")
+    parser.add_argument("--halo", type=float, default=10.0, help="Interaction distance in um (>= largest rule distance)")
+    parser.add_argument("--jobs", type=int, default=1, help="Windows checked in parallel")
+    parser.add_argument("--klayout", default="klayout", help="KLayout executable")
+    parser.add_argument("--allow-uncovered", action="store_true",
+                        help="Only warn when the windows leave parts of the layout (dicing lanes, marks) unchecked")
+    parser.add_argument("-D", "--define", action="append", default=[], metavar="NAME=VALUE",
+                        help="Additional deck variable, e.g. -D drc_mode=deep")
+    args = parser.parse_args()
+
+    windows = [pya.DBox(*[float(c) for c in window.split(",")]) for window in args.window] or args.windows
+    windowed_drc(args.layout, args.report, args.deck, windows, args.halo, args.window_size, args.klayout,
+                 dict(define.split("=", 1) for define in args.define), args.jobs, args.allow_uncovered)
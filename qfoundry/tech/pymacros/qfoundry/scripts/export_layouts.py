@@ -1,6 +1,6 @@
 # Klayout python script
 # Export all top cells in the current layout to inidivudal GDS files.
-# An generates a report of the exported layouts, the josephson jucntion 
+# An generates a report of the exported layouts, the josephson jucntion
 # locations and current (extracted from the Josephson Jucntion cell names)
 
 # Teh jospehson junctions are expected to be named as follows:
@@ -8,79 +8,122 @@
 #   where <type> = 'single_junction'
 #   <current> is the current in nA (separated by '_' e.g QW_single_junction_10_5_nA)
 
-import pya 
+# The source layout is never modified: layer 133/1 is left out through the save
+# options instead of being cleared. With jobs > 1 the top cells are written by a
+# process pool from a snapshot of the layout (standalone klayout Python module only,
+# the KLayout GUI cannot spawn Python worker processes).
+#
+# Standalone usage:
+#   python export_layouts.py reticle.gds --output-dir exported_layouts --format OASIS --jobs 8
+
+import pya
 import os
 import sys
+import tempfile
+import shutil
+
+# Layers that are not exported (ground exclusion)
+EXCLUDED_LAYERS = [pya.LayerInfo(133, 1)]
+
+FILE_EXTENSIONS = {"GDS2": "gds", "OASIS": "oas"}
+
+# Layout loaded once per worker process from the snapshot
+_snapshot_layout = None
+
+def _save_options(layout, cell_index, file_format="GDS2"):
+    """Save options writing cell_index and its children, without the excluded layers."""
+    save_options = pya.SaveLayoutOptions()
+    save_options.format = file_format
+    save_options.deselect_all_layers()
+    for layer_index in layout.layer_indexes():
+        if not any(layout.get_info(layer_index).is_equivalent(excluded) for excluded in EXCLUDED_LAYERS):
+            save_options.add_layer(layer_index, layout.get_info(layer_index))
+    save_options.add_cell(cell_index)
+    if file_format == "OASIS":
+        save_options.oasis_write_cblocks = True
+        save_options.oasis_strict_mode = True
+        save_options.oasis_compression_level = 10
+    return save_options
+
+def _junction_report(cell):
+    """Extract Josephson junction information for all the josephson junctions in this cell."""
+    report_data = []
+    for instance in cell.each_inst():
+        inst_cell = instance.cell
+        if "QW_single_junction" in inst_cell.name:
+            # Extract the current from the cell name
+            parts = inst_cell.name.split('_')
+            cell_location = instance.trans.disp
+            if len(parts) >= 4 and parts[-1] == "nA":
+                current: float = int(parts[-3]) + float('0.' + parts[-2])  # Convert to nA
+                # Append to report data
+                report_data.append((cell.name, inst_cell.name, cell_location, current))
+    return report_data
+
+def _export_cell(layout, cell_index, output_dir, file_format):
+    cell = layout.cell(cell_index)
+    file_path = os.path.join(output_dir, f"{cell.name}.{FILE_EXTENSIONS[file_format]}")
+    layout.write(file_path, _save_options(layout, cell_index, file_format))
+    return _junction_report(cell)
+
+def _load_snapshot(snapshot_path):
+    global _snapshot_layout
+    _snapshot_layout = pya.Layout()
+    _snapshot_layout.read(snapshot_path)
+
+def _export_worker(cell_name, output_dir, file_format):
+    """Export one top cell from the worker's snapshot. Locations are returned as plain tuples (picklable)."""
+    cell = _snapshot_layout.cell(cell_name)
+    report_data = _export_cell(_snapshot_layout, cell.cell_index(), output_dir, file_format)
+    return [(parent, name, (location.x, location.y), current) for parent, name, location, current in report_data]
+
+def export_layouts(layout, output_dir, file_format="GDS2", jobs=1):
+    """
+    Export every top cell of the layout to its own file and collect the junction report.
+
+    Args:
+        layout (pya.Layout): Source layout, left unmodified.
+        output_dir (str): Directory receiving one file per top cell.
+        file_format (str): "GDS2" or "OASIS" (written with CBLOCK compression).
+        jobs (int): Number of worker processes. 1 exports serially in this process.
+
+    Returns:
+        list[tuple]: (top cell name, junction cell name, location, current in nA) per junction.
+    """
+    if file_format not in FILE_EXTENSIONS:
+        raise ValueError(f"Unsupported export format {file_format}, expected one of {list(FILE_EXTENSIONS)}")
 
-def export_layouts(layout, output_dir):
     # Create output directory if it does not exist
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # Initialize report data
-    report_data = []
-
-    # Iterate over all top cells in the layout
-    for cell_index in layout.each_top_cell():
-        cell = layout.cell(cell_index)
-        cell_name = cell.name
-        file_path = os.path.join(output_dir, f"{cell_name}.gds")
-        
-        # Remove anything in layers 133/1
-        # Remove all shapes from layer 133/1
-        layer_info = pya.LayerInfo(133, 1)
-        if layout.layer(layer_info) is not None:
-            layer_index = layout.layer(layer_info)
-            cell.shapes(layer_index).clear()
-
-        # Export the cell to GDS file
-        save_options = pya.SaveLayoutOptions()
-        save_options.format = "GDS2"
-        save_options.select_all_layers()
-        save_options.add_cell(cell_index)
-        layout.write(file_path, save_options)
-        
-        # Extract Josephson junction information for all the josephson junctions
-        # junction in this cell
-        
-        for instance in cell.each_inst():
-            inst_cell = instance.cell
-            if "QW_single_junction" in inst_cell.name:
-                # Extract the current from the cell name
-                parts = inst_cell.name.split('_')
-                cell_location = instance.trans.disp
-                if len(parts) >= 4 and parts[-1] == "nA":
-                    current: float = int(parts[-3]) + float('0.' + parts[-2])  # Convert to nA
-                    # Append to report data
-                    report_data.append((cell_name, inst_cell.name, cell_location, current))
+    top_cells = list(layout.each_top_cell())
+    if jobs <= 1 or len(top_cells) <= 1:
+        report_data = []
+        for cell_index in top_cells:
+            report_data += _export_cell(layout, cell_index, output_dir, file_format)
+        return report_data
 
+    from concurrent.futures import ProcessPoolExecutor
 
+    # Read-only snapshot shared by the workers
+    snapshot_dir = tempfile.mkdtemp(prefix="qfoundry_export_")
+    try:
+        snapshot_path = os.path.join(snapshot_dir, "snapshot.oas")
+        layout.write(snapshot_path)
+        cell_names = [layout.cell(cell_index).name for cell_index in top_cells]
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_load_snapshot, initargs=(snapshot_path,)) as pool:
+            results = pool.map(_export_worker, cell_names, [output_dir]*len(cell_names), [file_format]*len(cell_names))
+            # Merge in top cell order, matching the serial export
+            report_data = []
+            for cell_report in results:
+                report_data += [(parent, name, pya.Vector(*location), current) for parent, name, location, current in cell_report]
+    finally:
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
     return report_data
 
-if __name__ == "__main__":
-    # Get the current layout
-    layout = pya.Application.instance().main_window().current_view().active_cellview().layout()
-    
-    # Define output directory
-    output_dir = "exported_layouts"
-    
-    cellview = pya.Application.instance().main_window().current_view().active_cellview()
-    if cellview.filename():
-        working_dir = os.path.dirname(cellview.filename())
-        output_dir = os.path.join(working_dir, output_dir)
-        print(f"Exporting layouts to: {output_dir}")
-    else:
-        print(f"No file path found, using current directory: {output_dir}")
-    # Export layouts and get report data
-    report_data = export_layouts(layout, output_dir)
-    
-    # Print report
-    print("Exported Layouts Report:")
-    for _, cell_name, cell_location, current in report_data:
-        print(f"Cell: {cell_name}\t Location: {cell_location}\t Ic: {current} nA")
-
+def write_report(report_data, report_file):
     # Save report to a text file
-    report_file = os.path.join(output_dir, "export_report.txt")
     with open(report_file, "w") as f:
         f.write("Exported Layouts Report:\n")
         f.write("========================================\n")
@@ -92,3 +135,44 @@ if __name__ == "__main__":
                 f.write("Cell Name\t Location\t Ic (nA)\n")
                 f.write("-" * 50 + "\n")
             f.write(f"{cell_name}\t {cell_location}\t {current}\n")
+
+if __name__ == "__main__":
+    application = getattr(pya, "Application", None)
+    main_window = application.instance().main_window() if application and application.instance() else None
+
+    if main_window is not None:
+        # Get the current layout
+        layout = main_window.current_view().active_cellview().layout()
+
+        # Define output directory
+        output_dir = "exported_layouts"
+
+        cellview = main_window.current_view().active_cellview()
+        if cellview.filename():
+            working_dir = os.path.dirname(cellview.filename())
+            output_dir = os.path.join(working_dir, output_dir)
+            print(f"Exporting layouts to: {output_dir}")
+        else:
+            print(f"No file path found, using current directory: {output_dir}")
+        # Export layouts and get report data
+        report_data = export_layouts(layout, output_dir)
+    else:
+        import argparse
+        parser = argparse.ArgumentParser(description="Export every top cell of a layout to individual files.")
+        parser.add_argument("layout", help="Input GDS/OASIS file")
+        parser.add_argument("--output-dir", default="exported_layouts")
+        parser.add_argument("--format", default="GDS2", choices=list(FILE_EXTENSIONS))
+        parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+        args = parser.parse_args()
+
+        layout = pya.Layout()
+        layout.read(args.layout)
+        output_dir = args.output_dir
+        report_data = export_layouts(layout, output_dir, file_format=args.format, jobs=args.jobs)
+
+    # Print report
+    print("Exported Layouts Report:")
+    for _, cell_name, cell_location, current in report_data:
+        print(f"Cell: {cell_name}\t Location: {cell_location}\t Ic: {current} nA")
+
+    write_report(report_data, os.path.join(output_dir, "export_report.txt"))
@@ -0,0 +1,227 @@
+# Junction assignment: every Josephson junction (2/0) to its EBL writefield (98/0)
+# and its aluminum islands (1/0 + 130/1), through box-tree queries.
+#
+# The DRC decks check the writefield rules (junctions overlapping two writefields
+# or outside all of them) and the junction fragmentation (junctions spanning two
+# aluminum islands) with boolean operations over the whole chip. This checker
+# indexes the writefields and the islands in a bulk-loaded box tree (R-tree),
+# so each junction only meets the few shapes around it: O(n log n) overall.
+#
+# The result is an assignment table, one row per junction, with the writefield
+# containing it, the islands it contacts and a status:
+#   ok          - inside one writefield, on at most one island
+#   outside     - not in any writefield
+#   misaligned  - overlapping more than one writefield
+#   partial     - overlapping one writefield without being inside it
+#   fragmented  - contacting more than one island (as the DRC rule, the contact
+#                 pieces of junction and aluminum are counted)
+# The table is written as CSV, or as JSON grouped per writefield (the input of
+# the EBL job files) when the output ends in .json.
+#
+# Usage:
+#   python junction_assignment.py chip.gds [--output chip_junctions.csv] [--cell TOP]
+
+import pya
+import os
+import csv
+import json
+import math
+
+JUNCTION_LAYERS = [pya.LayerInfo(2, 0)]
+WRITEFIELD_LAYERS = [pya.LayerInfo(98, 0)]
+ISLAND_LAYERS = [pya.LayerInfo(1, 0), pya.LayerInfo(130, 1)]
+EXCEPTION_LAYERS = [pya.LayerInfo(111, 0)]
+
+
+class BoxTree:
+    """
+    Static R-tree over boxes, bulk loaded with Sort-Tile-Recursive packing.
+
+    Args:
+        boxes (list[tuple]): (left, bottom, right, top) of each entry, the entry index is its position.
+        leaf_size (int): Entries per leaf and children per node.
+    """
+
+    def __init__(self, boxes, leaf_size=16):
+        self.leaf_size = leaf_size
+        # Nodes are (left, bottom, right, top, children, is_leaf); leaf children are entry indices
+        level = self._pack([(box[0], box[1], box[2], box[3], index, True) for index, box in enumerate(boxes)], True)
+        while len(level) > 1:
+            level = self._pack(level, False)
+        self.root = level[0] if level else None
+        self.boxes = boxes
+
+    def _pack(self, items, leaves):
+        """Group items into nodes of leaf_size: vertical slices by x center, then runs by y center."""
+        n_nodes = math.ceil(len(items) / self.leaf_size)
+        if n_nodes == 0:
+            return []
+        slice_size = math.ceil(math.sqrt(n_nodes)) * self.leaf_size
+        items = sorted(items, key=lambda item: item[0] + item[2])
+        nodes = []
+        for start in range(0, len(items), slice_size):
+            vertical = sorted(items[start:start + slice_size], key=lambda item: item[1] + item[3])
+            for node_start in range(0, len(vertical), self.leaf_size):
+                children = vertical[node_start:node_start + self.leaf_size]
+                nodes.append((min(c[0] for c in children), min(c[1] for c in children),
+                              max(c[2] for c in children), max(c[3] for c in children),
+                              [c[4] for c in children] if leaves else children, leaves))
+        return nodes
+
+    def query(self, left, bottom, right, top):
+        """Indices of the entries whose box overlaps or touches the given box."""
+        if self.root is None:
+            return []
+        found, stack = [], [self.root]
+        while stack:
+            node = stack.pop()
+            if node[0] > right or node[2] < left or node[1] > top or node[3] < bottom:
+                continue
+            if node[5]:
+                for index in node[4]:
+                    box = self.boxes[index]
+                    if not (box[0] > right or box[2] < left or box[1] > top or box[3] < bottom):
+                        found.append(index)
+            else:
+                stack.extend(node[4])
+        return found
+
+
+def _layer_region(layout, cell, layer_infos):
+    """Flat region of the given layers below cell (not merged)."""
+    region = pya.Region()
+    for layer_info in layer_infos:
+        layer_index = layout.find_layer(layer_info)
+        if layer_index is not None:
+            region += pya.Region(cell.begin_shapes_rec(layer_index))
+    return region
+
+
+def _box_tuple(box):
+    return (box.left, box.bottom, box.right, box.top)
+
+
+def assign_junctions(layout, cell):
+    """
+    Assign every junction below cell to its writefield and islands.
+
+    Returns:
+        tuple: (rows, writefields). rows is a list of dicts with "junction", "bbox",
+               "writefield" (index or None), "writefields" (overlapped indices),
+               "islands" (island indices), "contacts" and "status". writefields is the
+               list of writefield bounding boxes. Boxes in μm.
+    """
+    dbu = layout.dbu
+    exceptions = _layer_region(layout, cell, EXCEPTION_LAYERS)
+    junctions = list((_layer_region(layout, cell, JUNCTION_LAYERS) - exceptions).each())
+    # Writefields are not merged: overlapping writefields are separate fields
+    writefields = list(_layer_region(layout, cell, WRITEFIELD_LAYERS).each())
+    island_region = _layer_region(layout, cell, ISLAND_LAYERS).merged() - exceptions
+    islands = list(island_region.each())
+
+    junction_tree = BoxTree([_box_tuple(junction.bbox()) for junction in junctions])
+    writefield_tree = BoxTree([_box_tuple(writefield.bbox()) for writefield in writefields])
+    island_tree = BoxTree([_box_tuple(island.bbox()) for island in islands])
+
+    # Junction/aluminum contact pieces, one boolean; each piece lies in exactly one junction
+    contacts = [[] for _ in junctions]
+    junction_region = pya.Region(junctions)
+    for piece in (junction_region & island_region).each():
+        point = next(piece.each_point_hull())
+        for index in junction_tree.query(*_box_tuple(piece.bbox())):
+            if junctions[index].inside(point):
+                contacts[index].append(point)
+                break
+
+    rows = []
+    for index, junction in enumerate(junctions):
+        junction_box = junction.bbox()
+        junction_piece = pya.Region(junction)
+        containing, overlapping = None, []
+        for wf_index in writefield_tree.query(*_box_tuple(junction_box)):
+            writefield = writefields[wf_index]
+            if writefield.is_box():
+                inside = writefield.bbox().contains(junction_box.p1) and writefield.bbox().contains(junction_box.p2)
+                overlaps = inside or not (junction_piece & pya.Region(writefield.bbox())).is_empty()
+            else:
+                inside = (junction_piece - pya.Region(writefield)).is_empty()
+                overlaps = inside or not (junction_piece & pya.Region(writefield)).is_empty()
+            if overlaps:
+                overlapping.append(wf_index)
+            if inside and containing is None:
+                containing = wf_index
+
+        island_indices = sorted({island_index for point in contacts[index]
+                                 for island_index in island_tree.query(point.x, point.y, point.x, point.y)
+                                 if islands[island_index].inside(point)})
+
+        status = []
+        if not overlapping:
+            status.append("outside")
+        elif len(overlapping) > 1:
+            status.append("misaligned")
+        elif containing is None:
+            status.append("partial")
+        if len(contacts[index]) > 1:
+            status.append("fragmented")
+        rows.append({
+            "junction": index,
+            "bbox": [round(c * dbu, 4) for c in _box_tuple(junction_box)],
+            "writefield": containing if len(overlapping) == 1 else None,
+            "writefields": overlapping,
+            "islands": island_indices,
+            "contacts": len(contacts[index]),
+            "status": "+".join(status) or "ok",
+        })
+    return rows, [[round(c * dbu, 4) for c in _box_tuple(writefield.bbox())] for writefield in writefields]
+
+
+def junctions_by_writefield(rows, writefields):
+    """Junctions grouped per writefield, for the EBL job files: [{"writefield", "bbox", "junctions"}, ...]."""
+    groups = [{"writefield": index, "bbox": box, "junctions": []} for index, box in enumerate(writefields)]
+    for row in rows:
+        if row["writefield"] is not None:
+            groups[row["writefield"]]["junctions"].append(row["junction"])
+    return groups
+
+
+def write_assignment(rows, writefields, file_path):
+    """Write the assignment table: CSV, or JSON grouped per writefield for a .json file."""
+    if file_path.endswith(".json"):
+        unassigned = [row for row in rows if row["writefield"] is None]
+        with open(file_path, "w") as f:
+            json.dump({"writefields": junctions_by_writefield(rows, writefields), "junctions": rows,
+                       "unassigned": [row["junction"] for row in unassigned]}, f, indent=1)
+        return
+    with open(file_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["junction", "left", "bottom", "right", "top", "writefield", "writefields", "islands",
+                         "contacts", "status"])
+        for row in rows:
+            writer.writerow([row["junction"]] + row["bbox"] +
+                            ["" if row["writefield"] is None else row["writefield"],
+                             " ".join(str(i) for i in row["writefields"]), " ".join(str(i) for i in row["islands"]),
+                             row["contacts"], row["status"]])
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Assign junctions to their writefields and islands.")
+    parser.add_argument("layout", help="GDS/OASIS file")
+    parser.add_argument("--output", default=None, help="Assignment table, .csv or .json (default: <layout>_junctions.csv)")
+    parser.add_argument("--cell", default=None, help="Top cell (default: the top cell of the layout)")
+    args = parser.parse_args()
+
+    layout = pya.Layout()
+    layout.read(args.layout)
+    cell = layout.cell(args.cell) if args.cell else layout.top_cell()
+    rows, writefields = assign_junctions(layout, cell)
+    output = args.output or os.path.splitext(args.layout)[0] + "_junctions.csv"
+    write_assignment(rows, writefields, output)
+
+    failing = [row for row in rows if row["status"] != "ok"]
+    for row in failing:
+        print(f"junction {row['junction']} at {row['bbox']}: {row['status']}")
+    print(f"{len(rows)} junctions, {len(writefields)} writefields, {len(failing)} failing, table in {output}")
+    sys.exit(1 if failing else 0)
@@ -1,76 +1,276 @@
 # $autorun
 
 import os
+import json
+import hashlib
 import pya
 import qfoundry as pdk
-from kqcircuits.util.library_helper import load_libraries 
+from kqcircuits.util.library_helper import load_libraries
+
+# Folders (relative to the qfoundry module) scanned for PCell declarations
+LIBRARY_FOLDERS = [
+  "chips",
+  "elements",
+  "junctions",
+  "qubits",
+]
+
+# Generated manifest of PCell names, parameter schemas and module paths.
+# It is rebuilt automatically whenever one of the PCell source files changes.
+MANIFEST_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "pcell_manifest.json")
+MANIFEST_VERSION = 1
+
+# PCell name -> PCell id in the library layout, filled in when the library is registered.
+# Lets PCells that instantiate other library PCells skip the lookup by name.
+PCELL_IDS = {}
 
 def reload_library():
+  return __PDK_Lib__(lazy = False, flush = True)
+
+def load_library():
   return __PDK_Lib__()
 
 # The PCell library declaration
 class __PDK_Lib__(pya.Library):
 
-  def __init__(self, technology = 'qfoundry'):
+  def __init__(self, technology = 'qfoundry', lazy = True, flush = False):
+    """
+    Register the QFoundry PCells.
+
+    Args:
+      technology (str): Technology the library is bound to.
+      lazy (bool): Register lightweight proxy declarations built from the PCell manifest.
+        The real PCell module is only imported when a cell is first instantiated.
+        Falls back to eager registration when the manifest is missing or out of date.
+      flush (bool): Force KQCircuits to reload its libraries (needed after editing PCell code).
+    """
     self.description = "QFoundry Library"
     self.technology = "qfoundry"
     tech = pya.Technology.technology_by_name(technology)
 
-    library_folders = [
-      "chips",
-      "elements",
-      "junctions",
-      "qubits",
-    ]
-    
-    pdk_module_path = os.path.dirname(pdk.__file__)
-
-    for library_name in library_folders:
-      print("Importing module: " + library_name)
-      library_path = os.path.join(pdk_module_path, library_name)  
-      root, _, files = next(os.walk(library_path))
-      
-      for file_name in files:
-        if file_name.endswith(".py") and file_name != "__init__.py":
-          print("Importing file: " + file_name)
-          #exec(open(os.path.join(root, file)).read())
-          cell_name = file_name[:-3]
-          cell_module= import_module_from_path(cell_name, os.path.join(root, file_name))
-          
-          
-          try:
-            obj = getattr(cell_module, cell_name)
-            if issubclass(obj,pya.PCellDeclarationHelper) or issubclass(obj, pya._PCellDeclarationHelperMixin): #Check if the type of the cell is a Klayout PCellDeclaration
-              self.layout().register_pcell(cell_module.__name__, obj())
-          except AttributeError as e:
-            print(f"Module {cell_module} may not be a PCell (no {cell_name} attribute) : {e}")
-          except Exception as e:
-            print(f"Error importing {cell_name} from {file_name}: {e}")
+    sources = pcell_sources()
+    PCELL_IDS.clear()
+    manifest = read_manifest(sources) if lazy else None
+
+    if manifest is None:
+      entries = self._register_eager(sources)
+      write_manifest(sources, entries)
+    else:
+      self._register_lazy(manifest)
 
     # TODO: The different cells need to be registered in accordance to their respective library fodlers to match KQCircuits Specification
-    load_libraries(flush = True)
+    load_libraries(flush = flush)
     self.register("qfoundry")
 
+  def _register_eager(self, sources):
+    """Import every PCell module, register its declaration and return the manifest entries."""
+    entries = []
+    for cell_name, file_path in sources:
+      print("Importing file: " + os.path.basename(file_path))
+      #exec(open(os.path.join(root, file)).read())
+      cell_module = import_module_from_path(cell_name, file_path)
+
+      try:
+        obj = getattr(cell_module, cell_name)
+        if issubclass(obj,pya.PCellDeclarationHelper) or issubclass(obj, pya._PCellDeclarationHelperMixin): #Check if the type of the cell is a Klayout PCellDeclaration
+          declaration = obj()
+          PCELL_IDS[cell_name] = self.layout().register_pcell(cell_module.__name__, declaration)
+          entries.append(_manifest_entry(cell_name, file_path, declaration))
+      except AttributeError as e:
+        print(f"Module {cell_module} may not be a PCell (no {cell_name} attribute) : {e}")
+      except Exception as e:
+        print(f"Error importing {cell_name} from {file_path}: {e}")
+    return entries
+
+  def _register_lazy(self, manifest):
+    """Register proxy declarations from the manifest without importing the PCell modules."""
+    for entry in manifest["cells"]:
+      try:
+        if entry["lazy"]:
+          declaration = _LazyPCellDeclaration(entry)
+        else:
+          # Parameter schema could not be serialized, import the module right away
+          declaration = _LazyPCellDeclaration(entry).declaration()
+        PCELL_IDS[entry["name"]] = self.layout().register_pcell(entry["name"], declaration)
+      except Exception as e:
+        print(f"Error registering {entry['name']} from {entry['path']}: {e}")
+
+
+class _LazyPCellDeclaration(pya.PCellDeclaration):
+  """
+  Proxy PCell declaration built from a manifest entry.
+
+  The parameter declarations come from the manifest so the library browser and
+  the parameter editor work without importing the PCell module. Everything that
+  needs the geometry code (coercion, layers, produce) is forwarded to the real
+  declaration, which is imported on first use.
+  """
+
+  def __init__(self, entry):
+    super(_LazyPCellDeclaration, self).__init__()
+    self._entry = entry
+    self._declaration = None
+    self._parameters = [_decode_parameter(p) for p in entry["parameters"]]
+
+  def declaration(self):
+    """Return the real PCell declaration, importing its module on first call."""
+    if self._declaration is None:
+      module = import_module_from_path(self._entry["name"], self._entry["path"])
+      self._declaration = getattr(module, self._entry["name"])()
+    return self._declaration
+
+  def get_parameters(self):
+    return self._parameters
+
+  def get_layers(self, parameters):
+    return self.declaration().get_layers(parameters)
+
+  def coerce_parameters(self, layout, parameters):
+    return self.declaration().coerce_parameters(layout, parameters)
+
+  def callback(self, layout, name, states):
+    return self.declaration().callback(layout, name, states)
+
+  def display_text(self, parameters):
+    if self._declaration is None:
+      return self._entry["name"]
+    return self._declaration.display_text(parameters)
+
+  def produce(self, layout, layers, parameters, cell):
+    return self.declaration().produce(layout, layers, parameters, cell)
+
+
+def pcell_sources():
+  """Return the (cell_name, file_path) of every candidate PCell file in the library folders."""
+  pdk_module_path = os.path.dirname(pdk.__file__)
+  sources = []
+  for library_name in LIBRARY_FOLDERS:
+    library_path = os.path.join(pdk_module_path, library_name)
+    root, _, files = next(os.walk(library_path))
+    for file_name in sorted(files):
+      if file_name.endswith(".py") and file_name != "__init__.py":
+        sources.append((file_name[:-3], os.path.join(root, file_name)))
+  return sources
+
+def _source_hashes(sources):
+  """Content hash of every PCell source file, used to detect a stale manifest."""
+  hashes = {}
+  for _, file_path in sources:
+    with open(file_path, "rb") as f:
+      hashes[os.path.relpath(file_path, os.path.dirname(pdk.__file__))] = hashlib.sha1(f.read()).hexdigest()
+  return hashes
+
+def read_manifest(sources, path = MANIFEST_PATH):
+  """
+  Load the PCell manifest if it is up to date with the PCell sources.
+
+  Returns:
+    dict: The manifest, or None if it is missing, unreadable or stale.
+  """
+  try:
+    with open(path, "r") as f:
+      manifest = json.load(f)
+  except (OSError, ValueError):
+    return None
+
+  if manifest.get("version") != MANIFEST_VERSION or manifest.get("sources") != _source_hashes(sources):
+    return None
+  return manifest
+
+def write_manifest(sources, entries, path = MANIFEST_PATH):
+  """Write the PCell manifest. Failing to write (e.g. read-only install) is not an error."""
+  manifest = {
+    "version": MANIFEST_VERSION,
+    "sources": _source_hashes(sources),
+    "cells": entries,
+  }
+  try:
+    with open(path, "w") as f:
+      json.dump(manifest, f, indent = 1)
+  except OSError as e:
+    print(f"Could not write PCell manifest {path}: {e}")
+
+def _manifest_entry(cell_name, file_path, declaration):
+  """Describe a registered PCell declaration: name, module path and parameter schema."""
+  entry = {"name": cell_name, "path": file_path, "lazy": True, "parameters": []}
+  try:
+    entry["parameters"] = [_encode_parameter(p) for p in declaration.get_parameters()]
+  except TypeError as e:
+    print(f"PCell {cell_name} will be imported at startup: {e}")
+    entry["lazy"] = False
+  return entry
+
+# Value types that can appear as parameter defaults, serialized through their string form
+_STRING_TYPES = {
+  "LayerInfo": (pya.LayerInfo, pya.LayerInfo.from_string),
+  "DBox": (pya.DBox, pya.DBox.from_s),
+  "DPoint": (pya.DPoint, pya.DPoint.from_s),
+  "DPolygon": (pya.DPolygon, pya.DPolygon.from_s),
+  "DPath": (pya.DPath, pya.DPath.from_s),
+}
+
+def encode_value(value):
+  """PCell parameter value as JSON data, geometry and layer values as {type name: string}."""
+  if value is None or isinstance(value, (bool, int, float, str)):
+    return value
+  if isinstance(value, (list, tuple)):
+    return [encode_value(v) for v in value]
+  for type_name, (value_type, _) in _STRING_TYPES.items():
+    if isinstance(value, value_type):
+      return {type_name: value.to_s()}
+  raise TypeError(f"cannot serialize parameter value {value!r}")
+
+def decode_value(value):
+  """Inverse of encode_value."""
+  if isinstance(value, list):
+    return [decode_value(v) for v in value]
+  if isinstance(value, dict):
+    (type_name, text), = value.items()
+    return _STRING_TYPES[type_name][1](text)
+  return value
+
+def _encode_parameter(parameter):
+  return {
+    "name": parameter.name,
+    "type": parameter.type,
+    "description": parameter.description,
+    "default": encode_value(parameter.default),
+    "hidden": parameter.hidden,
+    "readonly": parameter.readonly,
+    "unit": parameter.unit,
+    "choices": [[d, encode_value(v)] for d, v in zip(parameter.choice_descriptions(), parameter.choice_values())],
+  }
+
+def _decode_parameter(schema):
+  parameter = pya.PCellParameterDeclaration(schema["name"], schema["type"], schema["description"])
+  parameter.default = decode_value(schema["default"])
+  parameter.hidden = schema["hidden"]
+  parameter.readonly = schema["readonly"]
+  parameter.unit = schema["unit"]
+  for description, value in schema["choices"]:
+    parameter.add_choice(description, decode_value(value))
+  return parameter
+
 def import_module_from_path(module_name, file_path):
         '''
-        import a Python module given a path 
+        import a Python module given a path
         '''
         from importlib import util, invalidate_caches
         import sys
         from pathlib import Path
         invalidate_caches()
-        
+
         path = Path(file_path).resolve()
         spec = util.spec_from_file_location(module_name, path)
-        
+
         if not spec:
             raise Exception('Cannot import module: %s, from path: %s ' % (module_name,path))
-        
+
         module = util.module_from_spec(spec)
         sys.modules[module_name] = module  # Add it to sys.modules
-        spec.loader.exec_module(module)  # Execute the module code   
-             
-        return module    
+        spec.loader.exec_module(module)  # Execute the module code
+
+        return module
 
 
 if __name__ == "__main__":
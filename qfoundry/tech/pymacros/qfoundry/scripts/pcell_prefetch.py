@@ -0,0 +1,290 @@
+# PCell prefetch: evaluate the PCell variants of a chip assembly in a process pool.
+#
+# KLayout produces PCell variants one after another in the main process, so a chip
+# placing hundreds of distinct Transmon, TransmonStar or ManhattanFatLead variants
+# spends most of its regeneration time in produce_impl on a single core. This stage
+# collects the unique variants first (by PCell name and parameters), produces each
+# one in a worker process with its own layout and library, and ships the result
+# back as plain data: flat polygon point arrays per layer (see cache.py). The main
+# process only decodes them into static cells of the target layout.
+#
+# Prefetched variants are also stored in the geometry cache (cache.py), keyed by the
+# PCell source and the qfoundry modules it imports, so a rebuild with unchanged
+# PCells does not start the pool at all. A variant failing in a worker is reported
+# and left to KLayout, the other variants are still prefetched.
+#
+# Assemblies request their variants up front with prefetch_cells (junction_sweep does
+# with prefetch_jobs). An existing layout is read with read_layout, which keeps the
+# variants as written instead of producing them all again in the main process, and
+# replace_variants then regenerates them in the pool.
+#
+# The variant cells are flattened: subcells produced by a PCell (ports, labels)
+# become plain polygons of the static cell, and texts are not shipped.
+# Worker processes need the standalone klayout Python module, the KLayout GUI
+# cannot spawn them; with jobs=1 the variants are produced in this process.
+#
+# Usage:
+#   python pcell_prefetch.py chip.gds [--output chip_static.oas] [--cell TOP] [--jobs 8]
+
+import pya
+import ast
+import os
+import time
+
+from qfoundry.cache import decode_polygon, encode_polygon, geometry_cache, source_hash
+from qfoundry.scripts.sweep import LIBRARY_NAME, new_layout, variant_key
+from qfoundry.utils import layer_registry, rounding_salt
+
+PREFETCH_PCELLS = ("Transmon", "TransmonStar", "ManhattanFatLead")
+
+# Layout of the worker process, holding the variants it produced
+_worker_layout = None
+
+
+def _init_worker(dbu):
+    global _worker_layout
+    _worker_layout = new_layout(dbu)
+
+
+def _produce_variant(pcell_name, encoded_params):
+    """
+    Produce one variant in the worker layout.
+
+    Returns:
+        tuple: ({layer string: [encoded polygon, ...]}, None), or (None, error message) when the
+               variant could not be produced, so one failing variant does not abort the pool (picklable).
+    """
+    from qfoundry.scripts.library import decode_value
+    try:
+        params = {name: decode_value(value) for name, value in encoded_params.items()}
+        cell = _worker_layout.create_cell(pcell_name, LIBRARY_NAME, params)
+        if cell is None:
+            raise RuntimeError(f"{pcell_name} PCell not found in library {LIBRARY_NAME}")
+        layers = {}
+        for layer_index in _worker_layout.layer_indexes():
+            region = pya.Region(cell.begin_shapes_rec(layer_index))
+            if not region.is_empty():
+                layers[_worker_layout.get_info(layer_index).to_s()] = [encode_polygon(p) for p in region.each()]
+        # Variants are not reused by the worker, keep its layout small
+        _worker_layout.prune_cell(cell.cell_index(), -1)
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+    if not layers:
+        # KLayout reports produce errors itself and leaves the variant empty
+        return None, "produced no shapes"
+    return layers, None
+
+
+def _qfoundry_sources(file_path):
+    """The source file and every qfoundry module it imports, recursively."""
+    package_dir = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    files, pending = [], [os.path.realpath(file_path)]
+    while pending:
+        source = pending.pop()
+        if source in files or not os.path.exists(source):
+            continue
+        files.append(source)
+        with open(source, "rb") as f:
+            tree = ast.parse(f.read(), source)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.level == 0:
+                modules = [node.module or ""] + [f"{node.module}.{alias.name}" for alias in node.names]
+            elif isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            else:
+                continue
+            for module in modules:
+                if module.split(".")[0] != "qfoundry":
+                    continue
+                path = os.path.join(package_dir, *module.split(".")[1:])
+                pending += [path + ".py", os.path.join(path, "__init__.py")]
+    return sorted(files)
+
+
+def _pcell_salt(pcell_name):
+    """Cache salt of a PCell: hash of its source, of the qfoundry modules it imports and the rounding settings."""
+    from qfoundry.scripts.library import pcell_sources
+    file_path = dict(pcell_sources()).get(pcell_name)
+    hashes = [source_hash(source) for source in _qfoundry_sources(file_path)] if file_path else []
+    return "".join(hashes) + rounding_salt()
+
+
+def read_layout(file_path):
+    """
+    Read a layout without producing its PCell variants.
+
+    The layout is not bound to the QFoundry technology, so the library is not found and
+    KLayout keeps each variant as written (a cold proxy with its parameters) instead of
+    producing it again.
+    """
+    layout = pya.Layout()
+    layout.read(file_path)
+    return layout
+
+
+def collect_variants(layout, top_cell, pcell_names=PREFETCH_PCELLS):
+    """
+    Unique PCell variants placed below top_cell, live or read by read_layout.
+
+    Returns:
+        dict: Variant key -> (PCell name, {param_name: value}, [variant cell index, ...]).
+    """
+    variants = {}
+    for cell_index in [top_cell.cell_index()] + list(top_cell.called_cells()):
+        cell = layout.cell(cell_index)
+        if cell.is_pcell_variant():
+            pcell_name = cell.pcell_declaration().name()
+        elif cell.is_cold_proxy() and cell.library_name() == LIBRARY_NAME:
+            pcell_name = cell.basic_name()
+        else:
+            continue
+        if pcell_name not in pcell_names:
+            continue
+        params = cell.pcell_parameters_by_name()
+        key = (pcell_name, variant_key(params))
+        variants.setdefault(key, (pcell_name, params, []))[2].append(cell_index)
+    return variants
+
+
+def prefetch_geometry(variants, dbu, jobs=None):
+    """
+    Produce the geometry of every variant, from the geometry cache or in a process pool.
+
+    Args:
+        variants (dict): Variant key -> (PCell name, params, ...), as returned by collect_variants.
+        dbu (float): Database unit of the target layout.
+        jobs (int): Worker processes, defaults to the number of cores. 1 produces in this process.
+
+    Returns:
+        dict: Variant key -> {LayerInfo: Region}. Variants that failed to produce are left out.
+    """
+    from qfoundry.scripts.library import encode_value
+    geometry, missing = {}, []
+    salts = {}
+    for key, (pcell_name, params, *_) in variants.items():
+        if pcell_name not in salts:
+            salts[pcell_name] = _pcell_salt(pcell_name)
+        cache_key = geometry_cache.key("prefetch:" + pcell_name, params, dbu, salts[pcell_name])
+        shapes = geometry_cache.load(cache_key)
+        if shapes is None:
+            missing.append((key, cache_key, pcell_name, {name: encode_value(value) for name, value in params.items()}))
+        else:
+            geometry[key] = shapes
+
+    jobs = jobs or os.cpu_count() or 1
+    if not missing:
+        return geometry
+    names = [pcell_name for _, _, pcell_name, _ in missing]
+    encoded = [encoded_params for _, _, _, encoded_params in missing]
+    pool = None
+    if jobs <= 1 or len(missing) <= 1:
+        _init_worker(dbu)
+        results = map(_produce_variant, names, encoded)
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = ProcessPoolExecutor(max_workers=min(jobs, len(missing)), initializer=_init_worker, initargs=(dbu,))
+        # Small chunks balance variants of very different cost
+        results = pool.map(_produce_variant, names, encoded, chunksize=max(1, len(missing) // (4 * jobs)))
+    try:
+        for (key, cache_key, pcell_name, _), (layers, error) in zip(missing, results):
+            if error is not None:
+                print(f"Warning: {pcell_name} variant not prefetched ({error}), it is left to KLayout")
+                continue
+            shapes = {}
+            for layer, polygons in layers.items():
+                region = pya.Region()
+                region.insert([decode_polygon(polygon) for polygon in polygons])
+                shapes[pya.LayerInfo.from_string(layer)] = region
+            geometry_cache.store(cache_key, shapes)
+            geometry[key] = shapes
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return geometry
+
+
+def insert_geometry(layout, variants, geometry):
+    """
+    Static cells of the target layout holding the prefetched geometry.
+
+    Returns:
+        dict: Variant key -> pya.Cell, for the variants in geometry.
+    """
+    layers = layer_registry(layout)
+    cells = {}
+    for key, (pcell_name, *_) in variants.items():
+        if key not in geometry:
+            continue
+        cell = layout.create_cell(pcell_name)
+        for layer, region in geometry[key].items():
+            cell.shapes(layers.index(layer)).insert(region)
+        cells[key] = cell
+    return cells
+
+
+def prefetch_cells(layout, requests, jobs=None):
+    """
+    Static cells for the PCell variants a chip assembly is going to place, produced in parallel.
+
+    Args:
+        layout (pya.Layout): Target layout.
+        requests (list[tuple]): (PCell name, {param_name: value}) of each placement, duplicates allowed.
+        jobs (int): Worker processes, defaults to the number of cores.
+
+    Returns:
+        list[pya.Cell]: Static cell of each request (a PCell variant when it failed to prefetch),
+                        identical variants share one cell.
+    """
+    variants = {}
+    for pcell_name, params in requests:
+        variants.setdefault((pcell_name, variant_key(params)), (pcell_name, params))
+    cells = insert_geometry(layout, variants, prefetch_geometry(variants, layout.dbu, jobs))
+    # Variants that failed in the pool are produced by KLayout as usual
+    for key, (pcell_name, params) in variants.items():
+        if key not in cells:
+            cells[key] = layout.create_cell(pcell_name, LIBRARY_NAME, params)
+    return [cells[(pcell_name, variant_key(params))] for pcell_name, params in requests]
+
+
+def replace_variants(layout, top_cell, pcell_names=PREFETCH_PCELLS, jobs=None):
+    """
+    Regenerate the PCell variants below top_cell in parallel and replace them by static cells.
+    Variants that fail to produce are kept as they are.
+
+    Use it on a layout from read_layout: in a layout bound to the library every variant was
+    already produced once while reading.
+
+    Returns:
+        int: Number of unique variants replaced.
+    """
+    variants = collect_variants(layout, top_cell, pcell_names)
+    cells = insert_geometry(layout, variants, prefetch_geometry(variants, layout.dbu, jobs))
+    for key, (_, _, variant_indexes) in variants.items():
+        if key not in cells:
+            continue
+        static_index = cells[key].cell_index()
+        for variant_index in variant_indexes:
+            for parent_index in list(layout.cell(variant_index).each_parent_cell()):
+                parent = layout.cell(parent_index)
+                for instance in [i for i in parent.each_inst() if i.cell_index == variant_index]:
+                    instance.cell_index = static_index
+            layout.prune_cell(variant_index, -1)
+    return len(cells)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Produce the PCell variants of a layout in parallel as static cells.")
+    parser.add_argument("layout", help="GDS/OASIS file with PCell context information")
+    parser.add_argument("--output", default=None, help="Output layout (default: <layout>_static.oas)")
+    parser.add_argument("--cell", default=None, help="Top cell (default: the top cell of the layout)")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: number of cores)")
+    args = parser.parse_args()
+
+    layout = read_layout(args.layout)
+    top_cell = layout.cell(args.cell) if args.cell else layout.top_cell()
+    start = time.perf_counter()
+    n_variants = replace_variants(layout, top_cell, jobs=args.jobs)
+    output = args.output or os.path.splitext(args.layout)[0] + "_static.oas"
+    layout.write(output)
+    print(f"{n_variants} variants produced in {time.perf_counter() - start:.1f} s, written to {output}")
@@ -0,0 +1,166 @@
+# Headless parameter sweep generator for the QFoundry junction PCells
+#
+# Builds a grid of junction variants without a GUI session:
+#   - identical parameter sets are produced once and shared by all their grid points
+#   - each variant is placed with as few (regular array) instances as possible
+#   - labels are placed once per row/column instead of once per junction
+#   - optionally, the variants are produced in parallel as static cells (pcell_prefetch.py)
+#
+# Runs under `klayout -b -r <script>` or the standalone klayout Python module.
+
+import pya
+
+from qfoundry.utils import label_cell
+
+LIBRARY_NAME = "qfoundry"
+SWEEP_PCELLS = ("Manhattan", "ManhattanSQUID", "ManhattanFatLead")
+
+
+def new_layout(dbu=0.001, technology="qfoundry"):
+    """Create a bare layout bound to the QFoundry technology, registering the PDK library if needed."""
+    # The library is bound to the technology, a lookup without it never finds it
+    if pya.Library.library_by_name(LIBRARY_NAME, technology) is None:
+        from qfoundry.scripts.library import load_library
+        load_library()
+    layout = pya.Layout()
+    layout.dbu = dbu
+    layout.technology_name = technology
+    return layout
+
+
+def _plain(value):
+    """Convert numpy scalars to plain Python values accepted by pya."""
+    return value.item() if hasattr(value, "item") else value
+
+
+def _grid_axis(axis):
+    """Validate one sweep axis: {param_name: values}, all value lists of the same length."""
+    axis = {name: [_plain(v) for v in values] for name, values in (axis or {}).items()}
+    lengths = {len(values) for values in axis.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"All parameters swept along one axis need the same number of values, got {axis}")
+    return axis, (lengths.pop() if lengths else 1)
+
+
+def variant_key(params):
+    """Hashable key of a PCell parameter set, equal for identical variants."""
+    return tuple(sorted((name, value.to_s() if isinstance(value, pya.LayerInfo) else repr(value))
+                        for name, value in params.items()))
+
+
+def _rectangles(points):
+    """
+    Decompose a set of (column, row) grid points into rectangular blocks.
+
+    Returns:
+        list[tuple]: (column, row, n_columns, n_rows) for each block.
+    """
+    remaining = set(points)
+    blocks = []
+    for i, j in sorted(points, key=lambda p: (p[1], p[0])):
+        if (i, j) not in remaining:
+            continue
+        na = 1
+        while (i + na, j) in remaining:
+            na += 1
+        nb = 1
+        while all((i + k, j + nb) in remaining for k in range(na)):
+            nb += 1
+        for jj in range(j, j + nb):
+            for ii in range(i, i + na):
+                remaining.discard((ii, jj))
+        blocks.append((i, j, na, nb))
+    return blocks
+
+
+def junction_sweep(pcell_name, columns, rows=None, params=None, pitch=(400.0, 400.0), origin=(0.0, 0.0),
+                   layout=None, top_cell_name="top", column_label=None, row_label=None,
+                   label_layer=pya.LayerInfo(1, 0), label_mag=20, prefetch_jobs=None):
+    """
+    Place a grid of junction PCell variants in a new top cell.
+
+    Args:
+        pcell_name (str): One of SWEEP_PCELLS.
+        columns (dict): {param_name: values} swept along x. All lists must have the same length.
+        rows (dict): {param_name: values} swept along y. Optional.
+        params (dict): Fixed parameters shared by every grid point.
+        pitch (tuple): (dx, dy) grid pitch in μm.
+        origin (tuple): Position of the first grid point in μm.
+        layout (pya.Layout): Target layout, a new headless one is created if None.
+        top_cell_name (str): Name of the created top cell.
+        column_label (str): Format string for the column labels, e.g. "w:{junction_width_b:.2f}".
+        row_label (str): Format string for the row labels.
+        label_layer (pya.LayerInfo): Layer of the label text.
+        label_mag (float): Label text magnification.
+        prefetch_jobs (int): Produce the variants in this many worker processes and place them as
+                             static cells (see pcell_prefetch.py). None places PCell variants
+                             produced one after another by KLayout.
+
+    Returns:
+        pya.Cell: The top cell holding the sweep.
+    """
+    if pcell_name not in SWEEP_PCELLS:
+        raise ValueError(f"Unsupported sweep PCell {pcell_name}, expected one of {SWEEP_PCELLS}")
+
+    columns, n_cols = _grid_axis(columns)
+    rows, n_rows = _grid_axis(rows)
+    params = {name: _plain(value) for name, value in (params or {}).items()}
+    layout = layout or new_layout()
+    top_cell = layout.create_cell(top_cell_name)
+    dx, dy = pitch
+    x0, y0 = origin
+
+    # Collect the distinct variants with their grid points
+    variants = {}
+    for j in range(n_rows):
+        for i in range(n_cols):
+            point_params = dict(params)
+            point_params.update({name: values[i] for name, values in columns.items()})
+            point_params.update({name: values[j] for name, values in rows.items()})
+            variants.setdefault(variant_key(point_params), (point_params, []))[1].append((i, j))
+
+    # Produce each distinct variant once
+    if prefetch_jobs:
+        from qfoundry.scripts.pcell_prefetch import prefetch_cells
+        cells = prefetch_cells(layout, [(pcell_name, p) for p, _ in variants.values()], prefetch_jobs)
+    else:
+        cells = [layout.create_cell(pcell_name, LIBRARY_NAME, p) for p, _ in variants.values()]
+    if any(cell is None for cell in cells):
+        raise RuntimeError(f"{pcell_name} PCell not found in library {LIBRARY_NAME}")
+
+    # Place every variant with regular arrays covering its grid points
+    n_instances = 0
+    for cell, (_, points) in zip(cells, variants.values()):
+        cell_index = cell.cell_index()
+        for i, j, na, nb in _rectangles(points):
+            trans = pya.DTrans(x0 + dx * i, y0 + dy * j)
+            if na == 1 and nb == 1:
+                top_cell.insert(pya.DCellInstArray(cell_index, trans))
+            else:
+                top_cell.insert(pya.DCellInstArray(cell_index, trans, pya.DVector(dx, 0), pya.DVector(0, dy), na, nb))
+            n_instances += 1
+
+    # One label per column (above the grid) and per row (left of the grid)
+    if column_label:
+        for i in range(n_cols):
+            text = column_label.format(**{name: values[i] for name, values in columns.items()})
+            cell = label_cell(layout, text, label_mag, label_layer)
+            top_cell.insert(pya.DCellInstArray(cell.cell_index(), pya.DTrans(x0 + dx * i - dx / 2, y0 + dy * n_rows - dy / 2)))
+    if row_label:
+        for j in range(n_rows):
+            text = row_label.format(**{name: values[j] for name, values in rows.items()})
+            cell = label_cell(layout, text, label_mag, label_layer)
+            top_cell.insert(pya.DCellInstArray(cell.cell_index(), pya.DTrans(x0 - dx, y0 + dy * j)))
+
+    print(f"Sweep {pcell_name}: {n_cols * n_rows} junctions, {len(variants)} variants, {n_instances} instances")
+    return top_cell
+
+
+def write_gds(layout, file_path, top_cell=None):
+    """Write the layout (or only top_cell and its children) to a GDS file."""
+    save_options = pya.SaveLayoutOptions()
+    save_options.format = "GDS2"
+    if top_cell is not None:
+        save_options.select_all_layers()
+        save_options.add_cell(top_cell.cell_index())
+    layout.write(file_path, save_options)
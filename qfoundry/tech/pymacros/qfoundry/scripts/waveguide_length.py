@@ -1,141 +1,241 @@
 
 import pya
+import numpy as np
+from dataclasses import dataclass
 
-def measure_waveguide_length(layout, selection):
+# Turns closer than this to 180 degrees [rad] are reversals, see centerline_lengths
+REVERSAL_TOLERANCE = 1e-6
+
+
+@dataclass
+class WaveguideLength:
+    """Length of one unique waveguide cell and the number of times it is placed."""
+    cell_name: str
+    width: float      # center conductor width 'a' [µm]
+    length: float     # length of a single occurrence [µm]
+    count: int        # occurrences in the measured hierarchy, array instances expanded
+
+    @property
+    def total(self):
+        return self.length * self.count
+
+
+def is_waveguide_cell(cell):
+    """Check if a cell is a WaveguideCoplanar or WaveguideComposite"""
+    cell_name = cell.name
+    return "Waveguide$Coplanar" in cell_name or "Waveguide$Composite" in cell_name
+
+
+def get_parameter_a(cell):
+    """
+    Try to extract the 'a' parameter (center conductor width) from a PCell.
+    Returns the parameter value in micrometers, or None if not found.
+    """
+    try:
+        # Check if this is a PCell variant
+        if cell.is_pcell_variant():
+            pcell_decl = cell.pcell_declaration()
+            if pcell_decl:
+                # Get the PCell parameters
+                params = cell.pcell_parameters_by_name()
+
+                # Try to get the 'a' parameter
+                if 'a' in params:
+                    return params['a']
+
+                # Some waveguides might store it differently
+                for key in params.keys():
+                    if 'width' in key.lower() and 'center' in key.lower():
+                        return params[key]
+                    if key.lower() == 'a':
+                        return params[key]
+    except Exception as e:
+        print(f"Warning: Could not extract parameter 'a' from cell {cell.name}: {e}")
+
+    # Default value if parameter not found (typical default from KQCircuits)
+    return 10.0  # Default center conductor width in micrometers
+
+
+def instance_counts(layout, cells):
+    """
+    Count how many times every cell occurs below the given root cells.
+
+    Each cell is visited once, in top-down order, and its count is pushed to its
+    children weighted by the instance array size (na*nb for regular arrays).
+
+    Args:
+        layout: KLayout Layout object
+        cells: Root cells (each root counts once)
+
+    Returns:
+        dict: {cell_index: number of occurrences}
+    """
+    counts = {}
+    for cell in cells:
+        counts[cell.cell_index()] = counts.get(cell.cell_index(), 0) + 1
+
+    for cell_index in layout.each_cell_top_down():
+        count = counts.get(cell_index, 0)
+        if count == 0:
+            continue
+        for inst in layout.cell(cell_index).each_inst():
+            child_index = inst.cell_index
+            counts[child_index] = counts.get(child_index, 0) + count * inst.size()
+    return counts
+
+
+def centerline_lengths(paths, radii):
+    """
+    Exact centerline length of waveguide paths with rounded corners, vectorized over all paths.
+
+    Every interior path point is a corner rounded with the turn radius r, so the
+    straight segments lose 2*r*tan(theta/2) and the arc adds r*theta, where theta
+    is the turn angle at that corner. A 180 degree reversal (tan(theta/2) is
+    unbounded) is counted as two 90 degree bends.
+
+    Args:
+        paths: List of (n_i, 2) arrays of path points [µm]
+        radii: Turn radius of each path [µm]
+
+    Returns:
+        np.ndarray: Centerline length of each path [µm]
+    """
+    n_paths = len(paths)
+    if n_paths == 0:
+        return np.zeros(0)
+    counts = np.array([len(p) for p in paths])
+    points = np.concatenate([np.asarray(p, dtype=float).reshape(-1, 2) for p in paths])
+    owner = np.repeat(np.arange(n_paths), counts)
+
+    # Segments between consecutive points of the same path
+    seg = np.diff(points, axis=0)
+    seg_valid = owner[:-1] == owner[1:]
+    seg_len = np.hypot(seg[:, 0], seg[:, 1]) * seg_valid
+    lengths = np.bincount(owner[:-1], weights=seg_len, minlength=n_paths)
+
+    # Corners between two valid consecutive segments
+    v1, v2 = seg[:-1], seg[1:]
+    corner_valid = seg_valid[:-1] & seg_valid[1:]
+    cross = v1[:, 0] * v2[:, 1] - v1[:, 1] * v2[:, 0]
+    dot = (v1 * v2).sum(axis=1)
+    theta = np.arctan2(np.abs(cross), dot)
+    reversal = theta > np.pi - REVERSAL_TOLERANCE
+    theta = np.where(reversal, np.pi / 2.0, theta)
+    r = np.asarray(radii, dtype=float)[owner[1:-1]]
+    correction = r * (theta - 2.0 * np.tan(theta / 2.0))
+    correction = np.where(corner_valid, np.where(reversal, 2.0 * correction, correction), 0.0)
+    lengths += np.bincount(owner[1:-1], weights=correction, minlength=n_paths)
+    return lengths
+
+
+def _pcell_path(cell):
+    """Return (points array, turn radius) from a waveguide PCell's 'path' and 'r' parameters, or None."""
+    if not cell.is_pcell_variant():
+        return None
+    params = cell.pcell_parameters_by_name()
+    path = params.get("path")
+    if path is None or "r" not in params:
+        return None
+    points = [(p.x, p.y) for p in path.each_point()]
+    if len(points) < 2:
+        return None
+    return np.array(points), float(params["r"])
+
+
+def waveguide_lengths(layout, cells, layer_info=pya.LayerInfo(130, 1), method="area"):
+    """
+    Measure every unique waveguide cell once and multiply by its occurrences.
+
+    With method="area" the length of a waveguide cell is the area of its own
+    geometry on layer_info divided by the center conductor width (parameter 'a').
+    With method="centerline" the length is computed analytically from the PCell
+    'path' and turn radius 'r' parameters (exact at bends), falling back to the
+    area estimate for cells without a path.
+
+    Args:
+        layout: KLayout Layout object
+        cells: Root cells to measure
+        layer_info: Measurement layer (130/1 - base metal gap)
+        method: "area" or "centerline"
+
+    Returns:
+        list[WaveguideLength]: One entry per unique waveguide cell, sorted by name
+    """
+    if method not in ("area", "centerline"):
+        raise ValueError(f"Unknown waveguide length method {method}, expected 'area' or 'centerline'")
+
+    layer_idx = layout.find_layer(layer_info)
+    if layer_idx is None and method == "area":
+        print(f"Warning: Layer {layer_info} not found in layout")
+        return []
+
+    dbu = layout.dbu
+    results = []
+    centerline_cells = []
+    for cell_index, count in instance_counts(layout, cells).items():
+        cell = layout.cell(cell_index)
+        if not is_waveguide_cell(cell):
+            continue
+
+        # Get the center conductor width parameter
+        width_a = get_parameter_a(cell)
+        if width_a is None or width_a == 0:
+            print(f"Warning: Could not determine width 'a' for {cell.name}, skipping")
+            continue
+
+        if method == "centerline":
+            path = _pcell_path(cell)
+            if path is not None:
+                centerline_cells.append((cell.name, width_a, count, path))
+                continue
+            if layer_idx is None:
+                continue
+
+        # Area of the cell's own shapes on the measurement layer, in dbu^2
+        area_dbu_sq = 0
+        for shape in cell.shapes(layer_idx).each():
+            if shape.is_polygon() or shape.is_box() or shape.is_path():
+                area_dbu_sq += abs(shape.area())
+
+        area_um_sq = area_dbu_sq * (dbu ** 2)
+        if area_um_sq > 0:
+            results.append(WaveguideLength(cell.name, width_a, area_um_sq / width_a, count))
+
+    # All path based waveguides are evaluated in one vectorized pass
+    lengths = centerline_lengths([c[3][0] for c in centerline_cells], [c[3][1] for c in centerline_cells])
+    for (cell_name, width_a, count, _), length in zip(centerline_cells, lengths):
+        results.append(WaveguideLength(cell_name, width_a, float(length), count))
+
+    return sorted(results, key=lambda r: r.cell_name)
+
+
+def measure_waveguide_length(layout, selection, method="area"):
     """
     Measure the total length of WaveguideCoplanar and WaveguideComposite cells
     in the selected cell and its nested hierarchy.
-    
+
     The length is calculated by measuring the area of geometry on layer 130/1
-    and dividing by the center conductor width (parameter 'a').
-    
+    and dividing by the center conductor width (parameter 'a'). Each unique
+    waveguide cell is measured once and weighted by its number of occurrences,
+    including regular array instances. With method="centerline" the length is
+    computed exactly from the waveguide path instead (see waveguide_lengths).
+
     Args:
         layout: KLayout Layout object
         selection: List of selected cells or cell instances
-        
+        method: "area" or "centerline"
+
     Returns:
         dict: Dictionary with cell names as keys and their measured lengths in micrometers
     """
-    
-    # Define the measurement layer (130/1 - base metal gap)
-    layer_info = pya.LayerInfo(130, 1)
-    layer_idx = layout.layer(layer_info)
-    
-    if layer_idx is None:
-        print("Warning: Layer 130/1 not found in layout")
-        return {}
-    
-    # Dictionary to store results: {cell_name: length_in_um}
-    waveguide_lengths = {}
-    total_length = 0.0
-    
-    # Get database unit
-    dbu = layout.dbu
-    
-    def is_waveguide_cell(cell):
-        """Check if a cell is a WaveguideCoplanar or WaveguideComposite"""
-        cell_name = cell.name
-        return "Waveguide$Coplanar" in cell_name or "Waveguide$Composite" in cell_name
-    
-    def get_parameter_a(cell):
-        """
-        Try to extract the 'a' parameter (center conductor width) from a PCell.
-        Returns the parameter value in micrometers, or None if not found.
-        """
-        try:
-            # Check if this is a PCell variant
-            if cell.is_pcell_variant():
-                pcell_decl = cell.pcell_declaration()
-                if pcell_decl:
-                    # Get the PCell parameters
-                    params = cell.pcell_parameters_by_name()
-                    
-                    # Try to get the 'a' parameter
-                    if 'a' in params:
-                        return params['a']
-                    
-                    # Some waveguides might store it differently
-                    for key in params.keys():
-                        if 'width' in key.lower() and 'center' in key.lower():
-                            return params[key]
-                        if key.lower() == 'a':
-                            return params[key]
-        except Exception as e:
-            print(f"Warning: Could not extract parameter 'a' from cell {cell.name}: {e}")
-        
-        # Default value if parameter not found (typical default from KQCircuits)
-        return 10.0  # Default center conductor width in micrometers
-    
-    def measure_cell_waveguide(cell, transformation=pya.Trans()):
-        """
-        Recursively measure waveguide length in a cell and its children.
-        
-        Args:
-            cell: The cell to measure
-            transformation: Cumulative transformation from parent cells
-        """
-        nonlocal total_length
-        
-        # Check if this cell itself is a waveguide
-        if is_waveguide_cell(cell):
-            # Get the center conductor width parameter
-            width_a = get_parameter_a(cell)
-            
-            if width_a is None or width_a == 0:
-                print(f"Warning: Could not determine width 'a' for {cell.name}, skipping")
-                return
-            
-            # Calculate the area of shapes on layer 130/1 in this cell
-            area_dbu_sq = 0.0
-            shapes_iter = cell.shapes(layer_idx)
-            
-            for shape in shapes_iter.each():
-                if shape.is_polygon() or shape.is_box() or shape.is_path():
-                    # Get the polygon and calculate its area
-                    if shape.is_polygon():
-                        poly = shape.polygon
-                    elif shape.is_box():
-                        poly = shape.box.to_dtype(dbu)
-                    elif shape.is_path():
-                        poly = shape.path.polygon()
-                    
-                    # Area in database units squared
-                    area_dbu_sq += abs(poly.area())
-            
-            # Convert area from dbu^2 to um^2
-            area_um_sq = area_dbu_sq * (dbu ** 2)
-            
-            # Calculate length: area / width
-            if area_um_sq > 0:
-                length_um = area_um_sq / width_a
-                
-                # Store result
-                cell_key = f"{cell.name} (a={width_a:.2f}µm)"
-                if cell_key in waveguide_lengths:
-                    waveguide_lengths[cell_key] += length_um
-                else:
-                    waveguide_lengths[cell_key] = length_um
-                
-                total_length += length_um
-                
-                print(f"  Found waveguide: {cell.name}")
-                print(f"    Area: {area_um_sq:.2f} µm², Width (a): {width_a:.2f} µm, Length: {length_um:.2f} µm")
-        
-        # Recursively process all instances in this cell
-        for inst in cell.each_inst():
-            child_cell = inst.cell
-            # Combine transformations
-            combined_trans = transformation * inst.trans
-            measure_cell_waveguide(child_cell, combined_trans)
-    
     # Process the selection
     print("\n=== Measuring Waveguide Lengths ===\n")
-    
+
     if not selection or len(selection) == 0:
         print("No cells selected. Please select a cell to measure.")
         return {}
-    
-    # Process each selected cell
+
+    cells = []
     for sel in selection:
         # Get the cell from the selection
         if hasattr(sel, 'cell'):
@@ -145,27 +245,36 @@ def measure_waveguide_length(layout, selection):
         else:
             # Assume it's already a cell
             cell = sel
-        
         print(f"Analyzing cell: {cell.name}")
-        print("-" * 50)
-        measure_cell_waveguide(cell)
-    
+        cells.append(cell)
+
+    results = waveguide_lengths(layout, cells, method=method)
+
+    # Dictionary to store results: {cell_name: length_in_um}
+    waveguide_lengths_um = {}
+    for result in results:
+        print(f"  Found waveguide: {result.cell_name} x{result.count}")
+        print(f"    Width (a): {result.width:.2f} µm, Length: {result.length:.2f} µm")
+        cell_key = f"{result.cell_name} (a={result.width:.2f}µm)"
+        waveguide_lengths_um[cell_key] = waveguide_lengths_um.get(cell_key, 0.0) + result.total
+    total_length = sum(result.total for result in results)
+
     # Print summary
     print("\n" + "=" * 50)
     print("SUMMARY")
     print("=" * 50)
-    
-    if waveguide_lengths:
-        for cell_name, length in sorted(waveguide_lengths.items()):
+
+    if waveguide_lengths_um:
+        for cell_name, length in sorted(waveguide_lengths_um.items()):
             print(f"{cell_name}: {length:.2f} µm")
         print("-" * 50)
         print(f"TOTAL LENGTH: {total_length:.2f} µm ({total_length/1000:.3f} mm)")
     else:
         print("No waveguides found in the selected cells.")
-    
+
     print("=" * 50 + "\n")
-    
-    return waveguide_lengths
+
+    return waveguide_lengths_um
 
 
 if __name__ == "__main__":
@@ -199,7 +308,7 @@ if __name__ == "__main__":
                 print("No cell available. Please open a layout and select a cell.")
         
         if selection:
-            results = measure_waveguide_length(layout, selection)
+            results = measure_waveguide_length(layout, selection, method="centerline")
 
             
             
@@ -0,0 +1,499 @@
+# EBL writefield partitioner: writefields (98/0) for the junctions (2/0) of a layout.
+#
+# Produces writefields such that every junction, grown by MIN_WF_JUNCTION_CLEARANCE,
+# is inside exactly one field, no field is larger than MAX_WRITEFIELD_SIZE, fields
+# do not overlap, and the number of fields (the e-beam write time) is kept low.
+# The limits are read from drc_config.lydrc, the same values as the writefield
+# rules of the DRC decks.
+#
+# Junctions whose clearance boxes overlap are first grouped into atoms, which no
+# field boundary may cut. Two partitions are then computed and the one with fewer
+# fields wins:
+#   - guillotine (x first and y first): the atoms are cut into strips along one
+#     axis, each strip ending at the furthest cut within MAX_WRITEFIELD_SIZE that
+#     crosses no atom (greedy, optimal in one dimension), then each strip along the
+#     other axis, and so on until a part fits in one field. A cut only has to avoid
+#     the atoms of the part it splits. Fails when a part has no free cut at all,
+#     as in uniformly dense junction arrays.
+#   - sweep: fields are grown from the leftmost unassigned atom, absorbing the
+#     atoms to its right while the field fits, overlaps no earlier field and cuts
+#     no other atom. Always valid.
+# Fields smaller than MIN_WRITEFIELD_SIZE are finally grown into the free space
+# around them, where that overlaps no other field and cuts no atom. A field that
+# cannot grow is merged into a neighbour, or re-split with it at another free cut.
+# Fields boxed in by their neighbours can still stay below MIN_WRITEFIELD_SIZE
+# (thin strips left between full fields in dense layouts); the DRC decks report
+# them as Writefield Too Small and the command line prints how many there are.
+#
+# Atoms and fields are looked up in uniform grids, so the run time grows about
+# linearly with the number of junctions.
+#
+# Usage:
+#   python writefield_partition.py chip.gds [--output chip_wf.gds] [--cell TOP] [--clear]
+
+import pya
+import os
+import re
+
+from qfoundry.scripts.drc_incremental import DRC_DIR, WRITEFIELD_LAYER
+from qfoundry.scripts.junction_assignment import JUNCTION_LAYERS, EXCEPTION_LAYERS, _layer_region
+
+WRITEFIELD_CELL = "WRITEFIELDS"
+# Atom lookups use grid cells of MAX_WRITEFIELD_SIZE / ATOM_GRID
+ATOM_GRID = 32
+# Consecutive rejected candidates after which a field stops growing (dense layouts)
+MAX_FAILURES = 64
+# Cuts tried when re-splitting an undersized field with a neighbour
+REBALANCE_CUTS = 16
+
+
+def drc_config(names=("MIN_WRITEFIELD_SIZE", "MAX_WRITEFIELD_SIZE", "MIN_WF_JUNCTION_CLEARANCE"),
+               file_path=os.path.join(DRC_DIR, "drc_config.lydrc")):
+    """Numeric constants of drc_config.lydrc, name -> float."""
+    values = {}
+    with open(file_path) as f:
+        for line in f:
+            match = re.match(r"^([A-Z_]+)\s*=\s*(-?[0-9.]+)", line)
+            if match and match.group(1) in names:
+                values[match.group(1)] = float(match.group(2))
+    missing = set(names) - set(values)
+    if missing:
+        raise ValueError(f"{file_path} does not define {sorted(missing)}")
+    return values
+
+
+def _overlaps(a, b):
+    """Boxes (left, bottom, right, top) share area (touching edges do not count)."""
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+def _union(a, b):
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+
+def _fits(box, max_size):
+    return box[2] - box[0] <= max_size and box[3] - box[1] <= max_size
+
+
+def _difference(outer, inner):
+    """Boxes covering outer minus inner, inner being inside outer."""
+    boxes = [(outer[0], outer[1], inner[0], outer[3]), (inner[2], outer[1], outer[2], outer[3]),
+             (inner[0], outer[1], inner[2], inner[1]), (inner[0], inner[3], inner[2], outer[3])]
+    return [box for box in boxes if box[0] < box[2] and box[1] < box[3]]
+
+
+class _GridIndex:
+    """Boxes by key in a uniform grid, for overlap queries."""
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.boxes = {}
+
+    def _cells(self, box):
+        size = self.cell_size
+        return [(x, y) for x in range(int(box[0] // size), int(box[2] // size) + 1)
+                for y in range(int(box[1] // size), int(box[3] // size) + 1)]
+
+    def insert(self, key, box):
+        self.boxes[key] = box
+        for cell in self._cells(box):
+            self.cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        for cell in self._cells(self.boxes.pop(key)):
+            self.cells[cell].discard(key)
+
+    def query(self, box):
+        """Keys of the boxes overlapping box."""
+        found = set()
+        for cell in self._cells(box):
+            found.update(key for key in self.cells.get(cell, ()) if _overlaps(self.boxes[key], box))
+        return found
+
+
+def atoms(boxes, max_size):
+    """
+    Group the junction boxes no writefield boundary may separate: overlapping boxes,
+    and boxes overlapping the extent of such a group.
+
+    Returns:
+        list[tuple]: (extent, [box index, ...]) per atom.
+    """
+    groups = {index: (box, [index]) for index, box in enumerate(boxes)}
+    index = _GridIndex(max_size // ATOM_GRID)
+    for key, (extent, _) in groups.items():
+        index.insert(key, extent)
+    pending = list(groups)
+    while pending:
+        key = pending.pop()
+        if key not in groups:
+            continue
+        extent, members = groups[key]
+        others = index.query(extent) - {key}
+        if not others:
+            continue
+        index.remove(key)
+        for other in others:
+            other_extent, other_members = groups.pop(other)
+            index.remove(other)
+            extent = _union(extent, other_extent)
+            members = members + other_members
+        if not _fits(extent, max_size):
+            raise ValueError(f"junctions in {extent} (dbu) cannot be separated and exceed a writefield")
+        groups[key] = (extent, members)
+        index.insert(key, extent)
+        # The grown extent may reach further groups
+        pending.append(key)
+    return list(groups.values())
+
+
+def _runs(intervals, max_size):
+    """
+    Split intervals into runs, cutting only where no interval is crossed.
+
+    Each run ends at the furthest free cut within max_size of its start. When the
+    intervals chain further than max_size without a free cut, the run ends at the
+    first free cut after it (an oversized run, split along the other axis).
+
+    Args:
+        intervals (list[tuple]): (lo, hi, index), sorted by lo.
+
+    Returns:
+        list[list]: Indices of each run.
+    """
+    runs = []
+    i = 0
+    while i < len(intervals):
+        start, reach = intervals[i][0], intervals[i][1]
+        limit = start + max_size
+        cut = None
+        j = i + 1
+        while j < len(intervals):
+            lo, hi = intervals[j][0], intervals[j][1]
+            if lo >= reach:
+                if reach <= limit:
+                    cut = j
+                else:
+                    cut = cut or j
+                    break
+            if cut is not None and max(reach, hi) > limit:
+                break
+            reach = max(reach, hi)
+            j += 1
+        if j == len(intervals) and (cut is None or reach <= limit):
+            cut = j
+        runs.append([interval[2] for interval in intervals[i:cut]])
+        i = cut
+    return runs
+
+
+def guillotine_partition(extents, max_size, axis=0):
+    """
+    Recursive guillotine partition of the atoms, cutting along axis (0: x, 1: y) first.
+
+    Returns:
+        list[list]: Atom indices of each field.
+
+    Raises:
+        ValueError: A part exceeds a writefield and has no free cut along either axis.
+    """
+    fields = []
+    stack = [(list(range(len(extents))), axis, False)]
+    while stack:
+        members, axis, stuck = stack.pop()
+        extent = extents[members[0]]
+        for index in members[1:]:
+            extent = _union(extent, extents[index])
+        if _fits(extent, max_size):
+            fields.append(members)
+            continue
+        runs = _runs(sorted((extents[index][axis], extents[index][axis + 2], index) for index in members), max_size)
+        if len(runs) == 1:
+            if stuck:
+                raise ValueError(f"junctions in {extent} (dbu) have no free cut")
+            stack.append((members, 1 - axis, True))
+            continue
+        stack.extend((run, 1 - axis, False) for run in runs)
+    return fields
+
+
+def sweep_partition(extents, max_size):
+    """
+    Greedy partition: each field grows from the leftmost unassigned atom.
+
+    An atom is absorbed when the field extent still fits, overlaps no earlier field,
+    and every other unassigned atom the grown field overlaps can be absorbed too.
+    A field stops growing after MAX_FAILURES rejected candidates in a row.
+
+    Returns:
+        list[list]: Atom indices of each field.
+    """
+    # Coarse grid for the candidates of a field, fine grid for the closure queries
+    window_index, atom_index = _GridIndex(max_size), _GridIndex(max_size // ATOM_GRID)
+    for index, extent in enumerate(extents):
+        window_index.insert(index, extent)
+        atom_index.insert(index, extent)
+    field_index = _GridIndex(max_size)
+    assigned = [False] * len(extents)
+    fields = []
+    for seed in sorted(range(len(extents)), key=lambda index: (extents[index][0], extents[index][1])):
+        if assigned[seed]:
+            continue
+        members, extent = {seed}, extents[seed]
+        seed_y = extent[1] + extent[3]
+        window = (extent[0], extent[3] - max_size, extent[0] + max_size, extent[1] + max_size)
+        candidates = sorted((index for index in window_index.query(window) if not assigned[index]),
+                            key=lambda index: (extents[index][0], abs(extents[index][1] + extents[index][3] - seed_y)))
+        failures = 0
+        for candidate in candidates:
+            if candidate in members:
+                continue
+            if failures >= MAX_FAILURES:
+                break
+            trial, trial_extent = members | {candidate}, _union(extent, extents[candidate])
+            # Close over the atoms the grown field would cut. The previous extent is
+            # already closed, only the area added to it is searched.
+            checked = extent
+            while trial is not None:
+                if not _fits(trial_extent, max_size):
+                    trial = None
+                    break
+                added = _difference(trial_extent, checked)
+                if any(field_index.query(box) for box in added):
+                    trial = None
+                    break
+                cut = {index for box in added for index in atom_index.query(box)
+                       if not assigned[index] and index not in trial}
+                if not cut:
+                    break
+                checked = trial_extent
+                for index in cut:
+                    trial.add(index)
+                    trial_extent = _union(trial_extent, extents[index])
+            if trial is not None:
+                members, extent = trial, trial_extent
+                failures = 0
+            else:
+                failures += 1
+        for index in members:
+            assigned[index] = True
+        field_index.insert(len(fields), extent)
+        fields.append(sorted(members))
+    return fields
+
+
+def _grow(lo, hi, min_size):
+    """Candidate ranges of at least min_size around [lo, hi]: centred, then anchored at either end."""
+    missing = min_size - (hi - lo)
+    if missing <= 0:
+        return [(lo, hi)]
+    return [(lo - missing // 2, hi + missing - missing // 2), (lo, hi + missing), (lo - missing, hi)]
+
+
+def _small(box, min_size):
+    return box[2] - box[0] < min_size or box[3] - box[1] < min_size
+
+
+def _grown(box, own, exclude, atom_index, field_index, min_size, avoid=None):
+    """Box grown to min_size overlapping no field but exclude, no atom outside own and not avoid, or None."""
+    for left, right in _grow(box[0], box[2], min_size):
+        for bottom, top in _grow(box[1], box[3], min_size):
+            grown = (left, bottom, right, top)
+            if (not field_index.query(grown) - exclude and atom_index.query(grown) <= own
+                    and not (avoid and _overlaps(grown, avoid))):
+                return grown
+    return None
+
+
+def _replace(field_index, boxes, key, box):
+    field_index.remove(key)
+    field_index.insert(key, box)
+    boxes[key] = box
+
+
+def _rebalance(key, other, fields, boxes, extents, atom_index, field_index, min_size, max_size):
+    """
+    Re-split the atoms of field key and its neighbour other at a free cut, so that both
+    fields fit and reach min_size. Cuts closest to the middle are tried first.
+    """
+    members = fields[key] + fields[other]
+    for axis in (0, 1):
+        ordered = sorted(members, key=lambda index: extents[index][axis])
+        reach, cuts = extents[ordered[0]][axis + 2], []
+        for split in range(1, len(ordered)):
+            if reach <= extents[ordered[split]][axis]:
+                cuts.append(split)
+            reach = max(reach, extents[ordered[split]][axis + 2])
+        for split in sorted(cuts, key=lambda split: abs(2 * split - len(ordered)))[:REBALANCE_CUTS]:
+            parts = [ordered[:split], ordered[split:]]
+            extents_ab = []
+            for part in parts:
+                box = extents[part[0]]
+                for index in part[1:]:
+                    box = _union(box, extents[index])
+                extents_ab.append(box)
+            if not all(_fits(box, max_size) for box in extents_ab):
+                continue
+            exclude = {key, other}
+            first = _grown(extents_ab[0], set(parts[0]), exclude, atom_index, field_index, min_size,
+                           avoid=extents_ab[1])
+            second = first and _grown(extents_ab[1], set(parts[1]), exclude, atom_index, field_index, min_size,
+                                      avoid=first)
+            if first and second:
+                fields[key], fields[other] = parts
+                _replace(field_index, boxes, key, first)
+                _replace(field_index, boxes, other, second)
+                return True
+    return False
+
+
+def grow_fields(fields, atom_list, min_size, max_size):
+    """
+    Writefield boxes: the extent of each field's atoms, grown to min_size where the
+    grown box overlaps no other field and no atom of another field. A field that
+    cannot grow is merged into a neighbour when their common bounding box fits,
+    overlaps no third field and cuts no foreign atom, and the merged field is grown
+    again. Fields that still stay below min_size are returned as they are.
+
+    Returns:
+        list[tuple]: ((left, bottom, right, top), [junction index, ...]) per writefield.
+    """
+    atom_index, field_index = _GridIndex(max_size // ATOM_GRID), _GridIndex(max_size)
+    for index, (extent, _) in enumerate(atom_list):
+        atom_index.insert(index, extent)
+    extents = [extent for extent, _ in atom_list]
+    fields = [list(members) for members in fields]
+    boxes = []
+    for key, members in enumerate(fields):
+        box = atom_list[members[0]][0]
+        for index in members[1:]:
+            box = _union(box, atom_list[index][0])
+        boxes.append(box)
+        field_index.insert(key, box)
+
+    pending = [key for key in range(len(fields)) if _small(boxes[key], min_size)]
+    while pending:
+        key = pending.pop()
+        if fields[key] is None or not _small(boxes[key], min_size):
+            continue
+        box = boxes[key]
+        grown = _grown(box, set(fields[key]), {key}, atom_index, field_index, min_size)
+        if grown:
+            _replace(field_index, boxes, key, grown)
+            continue
+        around = (box[0] - min_size, box[1] - min_size, box[2] + min_size, box[3] + min_size)
+        neighbours = sorted(field_index.query(around) - {key}, key=lambda other: (
+            (lambda union: (union[2] - union[0]) * (union[3] - union[1]))(_union(box, boxes[other]))))
+        for other in neighbours:
+            union = _union(box, boxes[other])
+            own = set(fields[key]) | set(fields[other])
+            if not _fits(union, max_size) or field_index.query(union) - {key, other} or not atom_index.query(union) <= own:
+                continue
+            field_index.remove(key)
+            field_index.remove(other)
+            fields[other] += fields[key]
+            fields[key], boxes[key] = None, None
+            boxes[other] = union
+            field_index.insert(other, union)
+            if _small(union, min_size):
+                pending.append(other)
+            break
+        else:
+            # No merge: move the cut between the field and a neighbour instead
+            any(_rebalance(key, other, fields, boxes, extents, atom_index, field_index, min_size, max_size)
+                for other in neighbours)
+    return [(box, sorted(junction for index in members for junction in atom_list[index][1]))
+            for box, members in zip(boxes, fields) if members is not None]
+
+
+def partition_boxes(boxes, min_size, max_size):
+    """
+    Writefields for the given junction boxes (already grown by the clearance), in database units.
+
+    Args:
+        boxes (list[tuple]): (left, bottom, right, top) of each junction.
+        min_size (int): Minimum writefield size.
+        max_size (int): Maximum writefield size.
+
+    Returns:
+        list[tuple]: ((left, bottom, right, top), [junction index, ...]) per writefield.
+    """
+    if not boxes:
+        return []
+    atom_list = atoms(boxes, max_size)
+    extents = [extent for extent, _ in atom_list]
+    partitions = [sweep_partition(extents, max_size)]
+    for axis in (0, 1):
+        try:
+            partitions.append(guillotine_partition(extents, max_size, axis))
+        except ValueError:
+            pass
+    return grow_fields(min(partitions, key=len), atom_list, min_size, max_size)
+
+
+def partition_writefields(layout, cell, config=None):
+    """
+    Writefields for the junctions below cell.
+
+    Returns:
+        list[tuple]: (pya.Box, [junction index, ...]) per writefield, in database units.
+    """
+    config = config or drc_config()
+    dbu = layout.dbu
+    # Clearance and minimum rounded up, maximum rounded down to the grid
+    clearance = -int(-config["MIN_WF_JUNCTION_CLEARANCE"] // dbu)
+    min_size = -int(-config["MIN_WRITEFIELD_SIZE"] // dbu)
+    max_size = int(config["MAX_WRITEFIELD_SIZE"] // dbu)
+    junctions = _layer_region(layout, cell, JUNCTION_LAYERS) - _layer_region(layout, cell, EXCEPTION_LAYERS)
+    boxes = []
+    for junction in junctions.each():
+        box = junction.bbox()
+        boxes.append((box.left - clearance, box.bottom - clearance, box.right + clearance, box.top + clearance))
+    return [(pya.Box(*box), members) for box, members in partition_boxes(boxes, min_size, max_size)]
+
+
+def insert_writefields(layout, cell, fields, clear=False):
+    """Place the writefields in a WRITEFIELDS cell below cell; with clear, remove the existing writefields first."""
+    layer_index = layout.layer(WRITEFIELD_LAYER)
+    if clear:
+        layout.clear_layer(layer_index)
+    wf_cell = layout.create_cell(WRITEFIELD_CELL)
+    for box, _ in fields:
+        wf_cell.shapes(layer_index).insert(box)
+    cell.insert(pya.CellInstArray(wf_cell.cell_index(), pya.Trans()))
+    return wf_cell
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+    parser = argparse.ArgumentParser(description="Partition the junctions of a layout into EBL writefields.")
+    parser.add_argument("layout", help="GDS/OASIS file")
+    parser.add_argument("--output", default=None, help="Layout with the writefields (default: <layout>_wf.<ext>)")
+    parser.add_argument("--cell", default=None, help="Top cell (default: the top cell of the layout)")
+    parser.add_argument("--clear", action="store_true", help="Remove the existing writefields (98/0) first")
+    args = parser.parse_args()
+
+    layout = pya.Layout()
+    layout.read(args.layout)
+    cell = layout.cell(args.cell) if args.cell else layout.top_cell()
+    try:
+        fields = partition_writefields(layout, cell)
+    except ValueError as e:
+        print(f"No valid writefield partition: {e}")
+        sys.exit(1)
+    insert_writefields(layout, cell, fields, args.clear)
+
+    root, ext = os.path.splitext(args.layout)
+    output = args.output or root + "_wf" + ext
+    layout.write(output)
+    n_junctions = sum(len(members) for _, members in fields)
+    print(f"{n_junctions} junctions in {len(fields)} writefields, written to {output}")
+    min_size = drc_config()["MIN_WRITEFIELD_SIZE"]
+    small = [box for box, _ in fields if min(box.width(), box.height()) < -int(-min_size // layout.dbu)]
+    if small:
+        print(f"Warning: {len(small)} writefield(s) below MIN_WRITEFIELD_SIZE ({min_size} um), "
+              f"reported as Writefield Too Small by the DRC, e.g.:")
+        for box in small[:20]:
+            print(f"  {box.to_dtype(layout.dbu)}")
@@ -1,10 +1,61 @@
 
+import hashlib
+import os
+import weakref
+from math import acos, ceil, pi
+from xml.etree import ElementTree
+
 import pya
 
 NEGATIVE_LAYERS = [
     pya.LayerInfo(1, 0),
     pya.LayerInfo(130, 1),
 ]
+_NEGATIVE_KEYS = {(layer.layer, layer.datatype) for layer in NEGATIVE_LAYERS}
+
+# technology name -> (layer properties file, modification time, {layer name: pya.LayerInfo})
+_TECHNOLOGY_LAYERS = {}
+# id(layout) -> LayerRegistry, the entry is dropped when the layout is garbage collected
+_LAYER_REGISTRIES = {}
+
+# (character, dbu, mag) -> glyph region placed at the origin
+_GLYPHS = {}
+
+# Corner rounding of the PCells, set once for the technology.
+#   "adaptive" - the number of points per full circle is the smallest one keeping the chord
+#                error (sagitta) below ROUNDING_TOLERANCE, capped by the count of the call site
+#   "fixed"    - always the count of the call site
+ROUNDING_MODE = "adaptive"
+# Maximum chord error in μm, well below the optical lithography resolution
+ROUNDING_TOLERANCE = 0.05
+# Lower bound of the adaptive count (4 points per quarter circle)
+MIN_ROUNDING_POINTS = 16
+
+def rounding_points(radius: float, dbu: float = 0.001, max_points: int = 64, tolerance: float = None) -> int:
+    """
+    Number of points per full circle for rounding corners of the given radius.
+
+    Args:
+        radius (float): Rounding radius in μm.
+        dbu (float): Database unit, the tolerance is never taken below half a database unit.
+        max_points (int): Vertex budget, the fixed count used by the call site.
+        tolerance (float): Maximum chord error in μm. Defaults to ROUNDING_TOLERANCE.
+
+    Returns:
+        int: Points per full circle, a multiple of 4 between MIN_ROUNDING_POINTS and max_points.
+    """
+    if ROUNDING_MODE != "adaptive" or radius <= 0:
+        return max_points
+    tolerance = max(ROUNDING_TOLERANCE if tolerance is None else tolerance, dbu / 2)
+    if tolerance >= radius:
+        return min(max_points, MIN_ROUNDING_POINTS)
+    # Sagitta of a segment spanning 2*pi/n: radius * (1 - cos(pi/n)) <= tolerance
+    points = 4 * ceil(pi / acos(1 - tolerance / radius) / 4)
+    return min(max_points, max(MIN_ROUNDING_POINTS, points))
+
+def rounding_salt() -> str:
+    """ Rounding settings as a cache key salt, so cached PCell geometry follows them. """
+    return f"{ROUNDING_MODE}:{ROUNDING_TOLERANCE}:{MIN_ROUNDING_POINTS}"
 
 def _round_corners_and_append(polygon: pya.DPolygon, polygon_list: list[pya.DPolygon] = None, rounding_params: dict = None, dbu = 0.001) -> list[pya.DPolygon]:
     """ Helper function to round corners of a polygon and append it to a list.
@@ -33,7 +84,9 @@ def _round_corners_and_append(polygon: pya.DPolygon, polygon_list: list[pya.DPol
             "n": 64,  # number of point per rounded corner
         }
     """Rounds the corners of the polygon, converts it to integer coordinates, and adds it to the polygon list."""
-    polygon = polygon.round_corners(rounding_params["rinner"], rounding_params["router"], rounding_params["n"])
+    # "n" is the vertex budget, the adaptive mode uses fewer points on small radii
+    n = rounding_points(max(rounding_params["rinner"], rounding_params["router"]), dbu, rounding_params["n"])
+    polygon = polygon.round_corners(rounding_params["rinner"], rounding_params["router"], n)
     polygon_list.append(polygon.to_itype(dbu))  
     return polygon_list
             
@@ -64,30 +117,244 @@ def _substract_shapes(cell, shapesA, shapesB, layer) -> pya.Region:
         Returns:
             pya.Region: The region created from the subtraction of shapesB from shapesA and added to the layer.
     """
-    region = pya.Region(shapesA).merged()-pya.Region(shapesB).merged()
+    # Boolean operations merge their inputs, no need to merge them beforehand
+    region = pya.Region(shapesA)-pya.Region(shapesB)
     cell.shapes(layer).insert(region)
     return region
 
-def test_pcell(pcell_decl: pya.PCellDeclarationHelper,pcell_params:dict = None, pcell_trans: pya.Trans = None,technology: str = "qfoundry"):
+class ShapePipeline:
+    """ Deferred boolean pipeline writing merged regions to the layers of a cell.
+        add/subtract/size operations are recorded per layer. Consecutive additions (or subtractions)
+        are collected into a single region without merging, and each layer is evaluated with one
+        boolean per operation change and a single final merge when flushed at the end of produce_impl.
+
+        Example:
+            shapes = ShapePipeline(self.cell)
+            shapes.add(layer_metal, pad_shapes)
+            shapes.subtract(layer_metal, opening_shapes)
+            shapes.flush()
+
+        Args:
+            cell (pya.Cell): The cell receiving the shapes.
+    """
+
+    def __init__(self, cell):
+        self.cell = cell
+        self._operations = {}  # layer index -> [[operation, argument], ...]
+
+    def _layer_index(self, layer) -> int:
+        if isinstance(layer, pya.LayerInfo):
+            return self.cell.layout().layer(layer)
+        return layer
+
+    def _record(self, layer, operation, shapes):
+        if isinstance(shapes, (list, tuple)):
+            if not shapes:
+                return
+            # Region.insert has no unambiguous overload for a plain list, nothing is merged here
+            shapes = pya.Region(array=list(shapes))
+        operations = self._operations.setdefault(self._layer_index(layer), [])
+        if not operations or operations[-1][0] != operation:
+            operations.append([operation, pya.Region()])
+        operations[-1][1].insert(shapes)
+
+    def add(self, layer, shapes) -> "ShapePipeline":
+        """ Add shapes (pya.Region, polygon, box or list of polygons) to a layer (index or pya.LayerInfo). """
+        self._record(layer, "add", shapes)
+        return self
+
+    def subtract(self, layer, shapes) -> "ShapePipeline":
+        """ Subtract shapes from whatever has been added to the layer so far. """
+        self._record(layer, "subtract", shapes)
+        return self
+
+    def size(self, layer, d) -> "ShapePipeline":
+        """ Size what has been added to the layer so far by d (database units). """
+        self._operations.setdefault(self._layer_index(layer), []).append(["size", d])
+        return self
+
+    def region(self, layer) -> pya.Region:
+        """ Evaluate the operations recorded for a layer.
+            Returns:
+                pya.Region: The merged region, without inserting it in the cell.
+        """
+        region = pya.Region()
+        merged = True
+        for operation, argument in self._operations.get(self._layer_index(layer), []):
+            if operation == "add":
+                region.insert(argument)
+                merged = False
+            elif operation == "subtract":
+                region = region - argument
+                merged = True
+            else:
+                region = region.sized(argument)
+                merged = True
+        return region if merged else region.merged()
+
+    def flush(self) -> dict:
+        """ Insert the merged region of every layer in the cell and clear the pipeline.
+            Returns:
+                dict: layer index -> inserted pya.Region.
+        """
+        regions = {layer: self.region(layer) for layer in self._operations}
+        for layer, region in regions.items():
+            self.cell.shapes(layer).insert(region)
+        self._operations = {}
+        return regions
+
+def test_pcell(pcell_decl: pya.PCellDeclarationHelper,pcell_params:dict = None, pcell_trans: pya.Trans = None,technology: str = "qfoundry") -> pya.Layout:
     """
     Test a PCellDeclarationHelper Parametric Cell by creating a new layout and instanciating the PCell in the top cell.
+
+    In the GUI the layout is opened in a new view. In batch mode (klayout -b) or with the standalone
+    klayout Python module a bare layout with the technology database unit is used instead.
+
+    Returns:
+        pya.Layout: The layout holding the "top" cell.
     """
-    # Create a new layout instance
-    mw = pya.Application().instance().main_window()
-    ly = mw.create_layout('qfoundry', 1).layout()
+    tech = pya.Technology.technology_by_name(technology) if pya.Technology.has_technology(technology) else None
+    if pcell_trans is None:
+        pcell_trans = pya.Trans()
+
+    application = getattr(pya, "Application", None)
+    mw = application.instance().main_window() if application and application.instance() else None
+    if mw is None:
+        from qfoundry.scripts.sweep import new_layout
+        ly = new_layout(tech.dbu if tech else 0.001, technology)
+    else:
+        # Create a new layout instance
+        ly = mw.create_layout('qfoundry', 1).layout()
+        ly.dbu = 0.001
     top_cell = ly.create_cell('top')
-    ly.dbu = 0.001
-    tech = pya.Technology.technology_by_name(technology)
     
     print(pcell_decl)
     # Create a new cell and instantiate the PCell
-    cell = ly.create_cell(pcell_decl.__name__, "qfoundry", pcell_params)
+    cell = ly.create_cell(pcell_decl.__name__, "qfoundry", pcell_params or {})
     cell_instance = pya.CellInstArray(cell.cell_index(),pcell_trans)
     top_cell.insert(cell_instance)
 
-    # Select the top cell in the view   
-    lv = mw.current_view()
-    lv.select_cell(top_cell.cell_index(), 0)
+    if mw is not None:
+        # Select the top cell in the view   
+        lv = mw.current_view()
+        lv.select_cell(top_cell.cell_index(), 0)
+    return ly
+
+def technology_layers(technology: str = "qfoundry") -> dict:
+    """
+    Named layers of a technology, read from its layer properties file (.lyp).
+
+    The file is parsed once and read again only when it changes.
+
+    Returns:
+        dict: layer name -> pya.LayerInfo, empty when the technology is not registered.
+    """
+    if not pya.Technology.has_technology(technology):
+        return {}
+    path = pya.Technology.technology_by_name(technology).eff_layer_properties_file()
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return {}
+    cached = _TECHNOLOGY_LAYERS.get(technology)
+    if cached is not None and cached[:2] == (path, mtime):
+        return cached[2]
+
+    layers = {}
+    for element in ElementTree.parse(path).iter():
+        if element.tag not in ("properties", "group-members"):
+            continue
+        name, source = element.findtext("name"), element.findtext("source")
+        if not name or not source or "*" in source:
+            continue
+        layer_info = pya.LayerInfo.from_string(source.split("@")[0].strip())
+        if layer_info.is_null():
+            continue
+        layers.setdefault(name, layer_info)
+    _TECHNOLOGY_LAYERS[technology] = (path, mtime, layers)
+    return layers
+
+class LayerRegistry:
+    """ Layer lookups of one layout: technology layer names, LayerInfo and layer indices.
+        Resolved indices are cached and checked against the layout before reuse (deleted or
+        replaced layers are resolved again), the name table is dropped when the layout changes
+        technology. Only a weak reference to the layout is kept. Get the shared registry of a
+        layout with layer_registry(layout).
+
+        Example:
+            layers = layer_registry(self.layout)
+            layer_cap = layers.index(self.cap_layer)
+            if layers.is_negative(layer_cap):
+                ...
+
+        Args:
+            layout (pya.Layout): The layout the indices belong to.
+    """
+
+    def __init__(self, layout):
+        self._layout = weakref.ref(layout)
+        self._technology = None
+        self._names = {}
+        self._indexes = {}  # (layer, datatype, name) -> layer index
+
+    @property
+    def layout(self) -> pya.Layout:
+        """ The layout of the registry, None once it has been garbage collected. """
+        return self._layout()
+
+    def _technology_names(self) -> dict:
+        technology = self.layout.technology_name or "qfoundry"
+        if technology != self._technology:
+            self._technology = technology
+            self._names = technology_layers(technology)
+        return self._names
+
+    def info(self, layer) -> pya.LayerInfo:
+        """ LayerInfo of a technology layer name, a layer index or a LayerInfo. """
+        if isinstance(layer, pya.LayerInfo):
+            return layer
+        if isinstance(layer, int):
+            return self.layout.get_info(layer)
+        layer_info = self._technology_names().get(layer)
+        if layer_info is None:
+            raise ValueError(f"No layer named {layer!r} in technology {self._technology!r}")
+        return layer_info
+
+    def index(self, layer) -> int:
+        """ Layer index of a technology layer name or LayerInfo, creating the layer if needed. """
+        if isinstance(layer, int):
+            return layer
+        layer_info = self.info(layer)
+        key = (layer_info.layer, layer_info.datatype, layer_info.name)
+        index = self._indexes.get(key)
+        if index is None or not self.layout.is_valid_layer(index) or not self.layout.get_info(index).is_equivalent(layer_info):
+            index = self._indexes[key] = self.layout.layer(layer_info)
+        return index
+
+    def is_negative(self, layer) -> bool:
+        """ Whether the layer (name, LayerInfo or index) is drawn in negative lithography (NEGATIVE_LAYERS). """
+        layer_info = self.info(layer)
+        return (layer_info.layer, layer_info.datatype) in _NEGATIVE_KEYS
+
+def layer_registry(layout: pya.Layout) -> LayerRegistry:
+    """
+    Shared LayerRegistry of a layout.
+
+    The registry lives as long as the layout's Python object: it only holds a weak reference,
+    so layouts passed through here (a PCell library produces in its own layout) are not pinned.
+    """
+    key = id(layout)
+    registry = _LAYER_REGISTRIES.get(key)
+    if registry is None or registry.layout is not layout or layout._destroyed():
+        registry = _LAYER_REGISTRIES[key] = LayerRegistry(layout)
+        # id() values are reused, drop only the entry of this registry
+        weakref.finalize(layout, _drop_layer_registry, key, weakref.ref(registry))
+    return registry
+
+def _drop_layer_registry(key, registry_ref):
+    registry = registry_ref()
+    if registry is not None and _LAYER_REGISTRIES.get(key) is registry:
+        del _LAYER_REGISTRIES[key]
 
 def layer_by_name(ly: pya.Layout, layer_name: str) -> pya.LayerInfo:
     """
@@ -100,8 +367,61 @@ def layer_by_name(ly: pya.Layout, layer_name: str) -> pya.LayerInfo:
     Returns:
         pya.Layer: The found layer or None if not found.
     """
+    try:
+        return layer_registry(ly).info(layer_name)
+    except ValueError:
+        return None
 
-    for layer in pya.Technology.technology_by_name("qfoundry").layers():
-        if layer.name == layer_name:
-            return layer
-    return None
\ No newline at end of file
+def label_region(text: str, dbu: float = 0.001, mag: float = 20) -> pya.Region:
+    """
+    Label polygons as drawn by the Basic TEXT PCell (default font), built from cached glyphs.
+
+    Each character is rendered once per (dbu, mag) and the label is composed by translating the
+    glyphs with the fixed character pitch of the font.
+
+    Args:
+        text (str): The label text, lines separated by "\\n".
+        dbu (float): Database unit of the target layout.
+        mag (float): Text magnification, as the "mag" parameter of the TEXT PCell.
+
+    Returns:
+        pya.Region: The label polygons with the first character at the origin.
+    """
+    generator = pya.TextGenerator.default_generator()
+    scale = generator.dbu() * mag / dbu
+    pitch_x = int(round(generator.width() * scale))
+    pitch_y = int(round(generator.height() * scale))
+
+    region = pya.Region()
+    for row, line in enumerate(text.split("\n")):
+        for column, char in enumerate(line):
+            key = (char, dbu, mag)
+            if key not in _GLYPHS:
+                _GLYPHS[key] = generator.text(char, dbu, mag)
+            region.insert(_GLYPHS[key].moved(column * pitch_x, -row * pitch_y))
+    return region
+
+def label_cell(layout: pya.Layout, text: str, mag: float = 20, layer = pya.LayerInfo(1, 0)) -> pya.Cell:
+    """
+    Get the static label cell for (text, mag, layer), creating it on first use.
+
+    Replaces per-instance Basic TEXT PCell variants: the cell name is derived from the key, so every
+    junction with the same label shares one cell in the layout.
+
+    Args:
+        layout (pya.Layout): The layout owning the label cell.
+        text (str): The label text.
+        mag (float): Text magnification.
+        layer (pya.LayerInfo or int): Label layer (LayerInfo or layer index of layout).
+
+    Returns:
+        pya.Cell: The label cell.
+    """
+    layer_info = layer if isinstance(layer, pya.LayerInfo) else layout.get_info(layer)
+    key = f"{text}|{mag}|{layer_info.to_s()}"
+    name = "LABEL_" + hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+    cell = layout.cell(name)
+    if cell is None:
+        cell = layout.create_cell(name)
+        cell.shapes(layout.layer(layer_info)).insert(label_region(text, layout.dbu, mag))
+    return cell